@@ -0,0 +1,276 @@
+# Benchmark harness: runs the engine's hot paths against the local stubs in benchmarks/stubs.py.
+#   python benchmarks/run.py                                    all scenarios, 1k and 10k title libraries
+#   python benchmarks/run.py -s match process --library 100000 --items 5000 --latency-ms 5 --error-rate 0.01
+#   python benchmarks/run.py --save-baseline bench_baseline.json
+#   python benchmarks/run.py --baseline bench_baseline.json --tolerance 10    exits 1 on a throughput regression
+#   python benchmarks/run.py -s fuzzy --library 50000 --items 5000             exits 1 if fuzzy p99 > --fuzzy-target-ms
+# Stubs run in this process; each case runs the engine in a fresh child process (own temp dir, own store),
+# so peak memory is the engine's alone and cases can't warm each other's caches.
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from stubs import SyntheticLibrary, StubPlex, StubArr, StubTrakt, synthetic_title, synthetic_year  # noqa: E402
+
+SCENARIOS = ("match", "process", "monitor", "submit", "trakt", "reconcile", "fuzzy")
+SERVICES = ("plex", "radarr", "sonarr", "trakt")
+
+def percentile(samples, pct):
+    if not samples: return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+try: import resource
+except ImportError: resource = None  # Windows: fall back to tracemalloc (Python allocations only)
+
+def peak_memory_mb():
+    if resource:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    import tracemalloc
+    return round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+
+# --- WORKLOADS ---
+def workload(n, size, seed=7):
+    # 60% exact titles in Plex, 10% near-misses (fuzzy path), 30% only in the downloaders
+    rng = random.Random(seed)
+    items = []
+    for k in range(n):
+        roll = rng.random()
+        i = rng.randrange(size) if roll < 0.7 else size + rng.randrange(size)
+        title = synthetic_title(i)
+        if 0.6 <= roll < 0.7: title = title.replace(" ", "  ").lower() + "!"
+        items.append({"title": title, "year": synthetic_year(i), "found": False})
+    return items
+
+def fuzzy_workload(n, size, seed=11):
+    # Typo'd library titles (one character replaced, dropped or doubled) and titles the library doesn't have,
+    # all with the year a caller would pass
+    rng = random.Random(seed)
+    items = []
+    for k in range(n):
+        i = rng.randrange(size)
+        title = synthetic_title(i if k % 4 else size + i)
+        p = rng.randrange(len(title))
+        title = (title[:p] + rng.choice("aeiourst") + title[p + 1:], title[:p] + title[p + 1:], title[:p] + title[p:])[k % 3]
+        items.append({"title": title, "year": synthetic_year(i), "found": False})
+    return items
+
+def missing_workload(n, size):
+    # Titles that are only in the downloaders (about 10% of them already tracked there)
+    picks = [size + (k * 7919) % size for k in range(n)]
+    return [{"title": synthetic_title(i), "year": synthetic_year(i), "found": False} for i in picks]
+
+# --- CHILD: one case against the stubs ---
+def run_case(spec):
+    if not resource:
+        import tracemalloc
+        tracemalloc.start()
+    sys.path.insert(0, REPO)
+    import media_core
+    from media_core import MediaEngine, DEFAULT_CONFIG, TitleMatcher
+
+    media_core.TRAKT_API = spec["trakt_api"]
+
+    config = {**DEFAULT_CONFIG, **spec["urls"], "plex_token": "bench", "radarr_key": "bench", "sonarr_key": "bench",
+              "trakt_client_id": "bench", "plex_movie_lib": "Movies", "plex_tv_lib": "TV Shows", "log_level": "info"}
+    engine = MediaEngine(config, log=lambda msg: None)
+    samples = {}
+
+    # Per-call client latency for every HTTP service (plexapi shares the "plex" session, so it is covered too)
+    for name in SERVICES:
+        engine.http.service(name).session.hooks["response"].append(
+            lambda resp, *a, _name=name, **kw: samples.setdefault(_name, []).append(resp.elapsed.total_seconds()))
+
+    m_type, n, size = spec["type"], spec["items"], spec["library"]
+    scenario = spec["scenario"]
+    start = time.perf_counter()
+    try:
+        if scenario == "match":
+            lib = engine.get_plex_lib(m_type)
+            engine.get_plex_index(lib)
+            samples["index_build"] = [time.perf_counter() - start]
+            calls = samples.setdefault("find_plex", [])
+            for item in workload(n, size):
+                t = time.perf_counter()
+                engine.find_plex(lib, item["title"], item["year"])
+                calls.append(time.perf_counter() - t)
+        elif scenario == "process":
+            engine.run_process("Bench", m_type, iter(workload(n, size)))
+        elif scenario == "monitor":
+            items = workload(n, size)
+            with engine.data_lock:
+                engine.store.create_collection("Bench", m_type)
+                engine.store.add_items("Bench", items)
+            start = time.perf_counter()
+            engine.run_monitor()
+        elif scenario == "submit":
+            submit = engine.arr_submitter(m_type)
+            items = missing_workload(n, size)
+            calls = samples.setdefault("submit_call", [])
+
+            def _one(item):
+                t = time.perf_counter()
+                submit(item)
+                calls.append(time.perf_counter() - t)
+            with ThreadPoolExecutor(max_workers=max(1, int(config["arr_workers"]))) as pool: list(pool.map(_one, items))
+        elif scenario == "trakt":
+            engine.trakt_list_items("bench", str(n), m_type)
+        elif scenario == "fuzzy":
+            # The trigram matcher alone (no requests): the same section-sized title set find_plex's fuzzy pass searches
+            matcher = TitleMatcher(float(config["fuzzy_threshold"]))
+            for i in range(size): matcher.add(synthetic_title(i), synthetic_year(i), i)
+            samples["index_build"] = [time.perf_counter() - start]
+            calls = samples.setdefault("fuzzy_query", [])
+            start = time.perf_counter()
+            for item in fuzzy_workload(n, size):
+                t = time.perf_counter()
+                matcher.query(item["title"], item["year"])
+                calls.append(time.perf_counter() - t)
+        elif scenario == "reconcile":
+            with engine.data_lock:
+                engine.store.create_collection("Bench", m_type)
+                engine.store.add_items("Bench", workload(n, size))
+            start = time.perf_counter()
+            engine.reconcile_collections()
+    finally:
+        elapsed = time.perf_counter() - start
+        http = engine.http.stats()
+        engine.shutdown()
+
+    result = {
+        "seconds": round(elapsed, 3),
+        "items_per_sec": round(n / elapsed, 1) if elapsed else None,
+        "latency_ms": {k: {"p50": round(percentile(v, 50) * 1000, 2), "p99": round(percentile(v, 99) * 1000, 2), "calls": len(v)}
+                       for k, v in samples.items() if v},
+        "errors": sum(st["errors"] for st in http.values()),
+        "retries": sum(st["retries"] for st in http.values()),
+        "peak_mb": peak_memory_mb(),
+    }
+    print(json.dumps(result))
+
+# --- PARENT ---
+def case_name(scenario, m_type, library, items):
+    return f"{scenario}/{m_type}@{library}/{items}"
+
+def seed_collection(plex, m_type, size, n):
+    # Plex already holds every other wanted title plus some strays, so reconcile has adds and removes to make
+    section = "1" if m_type == "movie" else "2"
+    lib = plex.libraries[section]
+    wanted = sorted({i for i in (lib.index_of(title=item["title"]) for item in workload(n, size)) if i is not None and i < size})
+    plex.seed_collection(section, "Bench", set(wanted[::2]) | set(range(size - n // 20, size)))
+
+def start_stubs(size, args):
+    opts = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate}
+    movies, shows = SyntheticLibrary(size, "movie"), SyntheticLibrary(size, "show")
+    return {"plex": StubPlex(movies, shows, **opts).start(), "radarr": StubArr(movies, "radarr", **opts).start(),
+            "sonarr": StubArr(shows, "sonarr", **opts).start(), "trakt": StubTrakt(movies if args.type == "movie" else shows, **opts).start()}
+
+def run_suite(args):
+    results = []
+    for size in args.library:
+        stubs = start_stubs(size, args)
+        urls = {"plex_url": stubs["plex"].url, "radarr_url": stubs["radarr"].url, "sonarr_url": stubs["sonarr"].url}
+        try:
+            for scenario in args.scenarios:
+                spec = {"scenario": scenario, "type": args.type, "library": size, "items": args.items, "urls": urls,
+                        "trakt_api": stubs["trakt"].url}
+                if scenario == "reconcile": seed_collection(stubs["plex"], args.type, size, args.items)
+                before = {k: dict(s.counts) for k, s in stubs.items()}
+                workdir = tempfile.mkdtemp(prefix="jmc-bench-")
+                try:
+                    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+                                          cwd=workdir, capture_output=True, text=True)
+                finally: shutil.rmtree(workdir, ignore_errors=True)
+                name = case_name(scenario, args.type, size, args.items)
+                if proc.returncode != 0 or not proc.stdout.strip():
+                    print(f"{name}: FAILED\n{proc.stderr.strip()[-2000:]}", file=sys.stderr)
+                    continue
+                result = {"case": name, "scenario": scenario, "type": args.type, "library": size, "items": args.items,
+                          **json.loads(proc.stdout.strip().splitlines()[-1])}
+                # Request counts come from the stubs, per endpoint, so plexapi's own calls are included
+                result["requests"] = {k: {e: c - before[k].get(e, 0) for e, c in s.counts.items() if c - before[k].get(e, 0)} for k, s in stubs.items()}
+                results.append(result)
+                print_result(result)
+        finally:
+            for s in stubs.values(): s.stop()
+    return results
+
+def print_result(r):
+    lat = ", ".join(f"{k} p50 {v['p50']:.1f} / p99 {v['p99']:.1f} ms ({v['calls']})" for k, v in sorted(r["latency_ms"].items()))
+    reqs = "; ".join(f"{k} {sum(v.values())} ({', '.join(f'{e} {c}' for e, c in sorted(v.items()))})" for k, v in sorted(r["requests"].items()) if v) or "none"
+    print(f"{r['case']:<32} {r['items_per_sec']:>10.1f} items/s  {r['seconds']:>8.2f}s  peak {r['peak_mb']} MB")
+    print(f"{'':<32} requests: {reqs} (errors {r['errors']}, retries {r['retries']})")
+    if lat: print(f"{'':<32} latency: {lat}")
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f: baseline = {r["case"]: r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nAgainst {baseline_path} (tolerance {tolerance:.0f}%):")
+    for r in results:
+        b = baseline.get(r["case"])
+        if not b:
+            print(f"  {r['case']:<32} (no baseline)")
+            continue
+        delta = (r["items_per_sec"] - b["items_per_sec"]) / b["items_per_sec"] * 100 if b["items_per_sec"] else 0.0
+        mem = (r["peak_mb"] or 0) - (b["peak_mb"] or 0)
+        flag = "REGRESSION" if delta < -tolerance else ""
+        regressions += bool(flag)
+        print(f"  {r['case']:<32} {b['items_per_sec']:>10.1f} -> {r['items_per_sec']:>10.1f} items/s ({delta:+.1f}%)  "
+              f"peak {mem:+.1f} MB  {flag}")
+    return regressions
+
+def check_fuzzy(results, target_ms):
+    # The fuzzy pass must stay sub-millisecond per query (p99) on libraries up to 50k titles
+    over = 0
+    for r in results:
+        lat = r["latency_ms"].get("fuzzy_query")
+        if not lat: continue
+        ok = lat["p99"] <= target_ms
+        over += not ok
+        print(f"  {r['case']:<32} fuzzy p99 {lat['p99']:.2f} ms (target {target_ms:g} ms)  {'' if ok else 'OVER TARGET'}")
+    return over
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks/run.py", description="Benchmark Jamie's Media Command against local stub servers")
+    parser.add_argument("-s", "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--library", type=int, nargs="+", default=[1000, 10000], help="synthetic Plex library sizes (1k-100k)")
+    parser.add_argument("--items", type=int, default=1000, help="list/collection size per case")
+    parser.add_argument("--type", choices=("movie", "show"), default="movie")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="added latency per stub request")
+    parser.add_argument("--jitter-ms", type=float, default=1.0, help="random extra latency per stub request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub requests answered with 503")
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    parser.add_argument("--save-baseline", help="write results as a baseline file")
+    parser.add_argument("--baseline", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="allowed items/sec drop (%%) before a case counts as a regression")
+    parser.add_argument("--fuzzy-target-ms", type=float, default=1.0, help="p99 per-query budget for the fuzzy scenario")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return run_case(json.loads(args.child))
+
+    results = run_suite(args)
+    doc = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "python": sys.version.split()[0],
+           "settings": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate}, "results": results}
+    for path in filter(None, (args.json_out, args.save_baseline)):
+        with open(path, "w") as f: json.dump(doc, f, indent=2)
+    failed = check_fuzzy(results, args.fuzzy_target_ms)
+    if args.baseline: failed += compare(results, args.baseline, args.tolerance)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
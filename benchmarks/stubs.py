@@ -0,0 +1,296 @@
+# In-process stand-ins for Plex, Radarr, Sonarr and Trakt used by benchmarks/run.py.
+# Each stub serves a deterministic synthetic library over real HTTP (so plexapi, requests pooling, retries and
+# rate limits are all exercised) with configurable per-request latency and error rate.
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from xml.sax.saxutils import quoteattr
+
+WORDS_A = ["Dark", "Silent", "Last", "Lost", "Red", "Broken", "Hidden", "Golden", "Iron", "Frozen",
+           "Wild", "Secret", "Burning", "Endless", "Crimson", "Hollow", "Savage", "Midnight", "Distant", "Fallen",
+           "Bright", "Final", "Shadow", "Electric", "Velvet", "Stone", "Paper", "Glass", "Northern", "Sacred"]
+WORDS_B = ["River", "Empire", "Kingdom", "Signal", "Harbor", "Garden", "Protocol", "Horizon", "Machine", "Witness",
+           "Frontier", "Highway", "Storm", "Orchard", "Circus", "Citadel", "Engine", "Lantern", "Mirror", "Voyage",
+           "Island", "Station", "Dynasty", "Echo", "Tower", "Canyon", "Theory", "Rebellion", "Desert", "Archive"]
+WORDS_C = ["", "Returns", "Rising", "Reborn", "Part II", "Chronicles", "Legacy", "Origins", "Redux", "Zero"]
+PLEX_SECTIONS = {"1": ("movie", "Movies"), "2": ("show", "TV Shows")}
+
+def synthetic_title(i):
+    # Deterministic and unique per index up to len(A) * len(B) * len(C) * 12 (~108k) titles
+    a, b = WORDS_A[i % len(WORDS_A)], WORDS_B[(i // len(WORDS_A)) % len(WORDS_B)]
+    rest = i // (len(WORDS_A) * len(WORDS_B))
+    c, n = WORDS_C[rest % len(WORDS_C)], rest // len(WORDS_C)
+    return " ".join(w for w in (("The" if n % 2 else ""), a, b, c, (str(n // 2 + 1) if n > 1 else "")) if w)
+
+def synthetic_year(i):
+    return 1950 + (i * 7) % 75
+
+class SyntheticLibrary:
+    # Titles 0..size-1 exist in Plex; titles size..2*size exist only in the downloaders' lookup results
+    def __init__(self, size, m_type="movie", arr_owned=0.1):
+        self.size = size
+        self.type = m_type
+        self.arr_owned = int(size * arr_owned)  # first N "not in Plex" titles are already tracked by Radarr/Sonarr
+        self.added_base = int(time.time()) - 86400 * 365
+        self.titles = None
+
+    def entry(self, i):
+        return {"title": synthetic_title(i), "year": synthetic_year(i), "tmdb": 100000 + i, "tvdb": 300000 + i, "imdb": f"tt{1000000 + i}"}
+
+    def index_of(self, ids=None, title=None):
+        if ids:
+            for k, base in (("tmdb", 100000), ("tvdb", 300000)):
+                if k in ids and 0 <= int(ids[k]) - base < 2 * self.size: return int(ids[k]) - base
+        if title is None: return None
+        if self.titles is None: self.titles = {synthetic_title(i).lower(): i for i in range(2 * self.size)}
+        return self.titles.get(title.lower())
+
+class StubServer:
+    # Base class: subclasses implement handle(method, path, query, headers, body) -> (status, content_type, body, headers)
+    name = "stub"
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=1):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.httpd = None
+
+    def count(self, key):
+        with self.lock: self.counts[key] = self.counts.get(key, 0) + 1
+
+    def roll_error(self):
+        with self.lock: return self.rng.random() < self.error_rate
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body go out as separate writes; don't let delayed ACKs add 40 ms
+
+            def do(self, method):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if stub.latency or stub.jitter: time.sleep(stub.latency + random.uniform(0, stub.jitter))
+                if stub.roll_error():
+                    stub.count("error")
+                    status, ctype, out, extra = 503, "text/plain", b"stub error", {}
+                else:
+                    status, ctype, out, extra = stub.handle(method, parts.path, parse_qs(parts.query), self.headers, body)
+                if isinstance(out, str): out = out.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(out)))
+                for k, v in extra.items(): self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(out)
+
+            def do_GET(self): self.do("GET")
+            def do_POST(self): self.do("POST")
+            def do_PUT(self): self.do("PUT")
+            def log_message(self, *args): pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+# --- PLEX ---
+# Enough of the PMS API for plexapi: server root, section list, paged /all (with Guids), the filter metadata
+# that search(filters=...) validates against, addedAt>> filtering, collections (listing and paged children)
+# and multi-edit PUTs, which add/remove collection members.
+COLLECTION_KEY_BASE = 90000
+
+class StubPlex(StubServer):
+    name = "plex"
+
+    def __init__(self, movies, shows, **kwargs):
+        super().__init__(**kwargs)
+        self.libraries = {"1": movies, "2": shows}
+        self.collections = {}  # (section, title) -> [ratingKey, set of library indices]
+
+    def seed_collection(self, section, title, indices):
+        with self.lock: self.collections[(section, title)] = [COLLECTION_KEY_BASE + len(self.collections), set(indices)]
+
+    def members(self, section, title):
+        with self.lock: return set(self.collections.get((section, title), (0, set()))[1])
+
+    def edit_collections(self, section, query):
+        indices = [int(rk[1:]) for rk in query.get("id", [""])[0].split(",") if rk[:1] == section and rk[1:].isdigit()]
+        with self.lock:
+            for k, (v,) in query.items():
+                if k.startswith("collection[") and k.endswith("].tag.tag"):
+                    entry = self.collections.setdefault((section, v), [COLLECTION_KEY_BASE + len(self.collections), set()])
+                    entry[1].update(indices)
+                elif k == "collection[].tag.tag-":
+                    for title in map(unquote, v.split(",")):
+                        if (section, title) in self.collections: self.collections[(section, title)][1].difference_update(indices)
+
+    def paged(self, headers, rows, extra=""):
+        start = int(headers.get("X-Plex-Container-Start") or 0)
+        size = int(headers.get("X-Plex-Container-Size") or 100)
+        page = rows[start:start + size]
+        return f'<MediaContainer size="{len(page)}" totalSize="{len(rows)}"{extra}>{"".join(page)}</MediaContainer>'
+
+    def video(self, section, i, lib):
+        e = lib.entry(i)
+        tag, kind = ("Video", "movie") if lib.type == "movie" else ("Directory", "show")
+        guids = "".join(f'<Guid id="{k}://{e[k]}"/>' for k in (("tmdb", "imdb") if kind == "movie" else ("tvdb", "imdb")))
+        return (f'<{tag} ratingKey="{section}{i}" key="/library/metadata/{section}{i}" type="{kind}" title={quoteattr(e["title"])} '
+                f'year="{e["year"]}" addedAt="{lib.added_base + i * 60}" librarySectionID="{section}">{guids}</{tag}>')
+
+    def handle(self, method, path, query, headers, body):
+        xml = "text/xml;charset=utf-8"
+        if path in ("/", "/library", "/library/"):
+            self.count("root")
+            return 200, xml, '<MediaContainer size="0" friendlyName="Bench" machineIdentifier="bench" version="1.40.0.0" myPlex="0"/>', {}
+        if path == "/library/sections":
+            self.count("sections")
+            dirs = "".join(f'<Directory key="{k}" type="{t}" title="{n}" agent="tv.plex.agents.{t}" scanner="Plex" language="en" uuid="{k}"/>'
+                           for k, (t, n) in PLEX_SECTIONS.items())
+            return 200, xml, f'<MediaContainer size="{len(PLEX_SECTIONS)}">{dirs}</MediaContainer>', {}
+        parts = path.strip("/").split("/")
+        if len(parts) == 4 and parts[:2] == ["library", "collections"] and parts[3] == "children":
+            self.count("collection_items")
+            with self.lock: found = next(((sec, set(m)) for (sec, _), (rk, m) in self.collections.items() if str(rk) == parts[2]), None)
+            if not found: return 404, xml, '<MediaContainer size="0"/>', {}
+            lib = self.libraries[found[0]]
+            return 200, xml, self.paged(headers, [self.video(found[0], i, lib) for i in sorted(found[1])]), {}
+        if len(parts) == 3 and parts[:2] == ["library", "metadata"] and parts[2][:1] in self.libraries and parts[2][1:].isdigit():
+            # Single-item fetch (plexapi reloads a partial object through this)
+            self.count("metadata")
+            section, i = parts[2][:1], int(parts[2][1:])
+            return 200, xml, f'<MediaContainer size="1">{self.video(section, i, self.libraries[section])}</MediaContainer>', {}
+        if len(parts) == 4 and parts[:2] == ["library", "sections"] and parts[2] in self.libraries:
+            section, lib, what = parts[2], self.libraries[parts[2]], parts[3]
+            if method == "PUT":
+                self.count("edit")
+                self.edit_collections(section, query)
+                return 200, xml, '<MediaContainer size="0"/>', {}
+            if query.get("type") == ["18"]:
+                self.count("collections")
+                with self.lock: cols = sorted((t, rk, len(m)) for (sec, t), (rk, m) in self.collections.items() if sec == section)
+                rows = [f'<Directory ratingKey="{rk}" key="/library/collections/{rk}/children" type="collection" title={quoteattr(t)} '
+                        f'subtype="{lib.type}" smart="0" childCount="{n}" librarySectionID="{section}"/>' for t, rk, n in cols]
+                return 200, xml, self.paged(headers, rows, f' librarySectionID="{section}"'), {}
+            if "includeMeta" in query:
+                self.count("meta")
+                if what != "all": return 200, xml, '<MediaContainer size="0"><Meta/></MediaContainer>', {}
+                return 200, xml, (f'<MediaContainer size="0" totalSize="{lib.size}"><Meta>'
+                                  f'<Type key="/library/sections/{section}/all?type=1" type="{lib.type}" title="{lib.type}" active="1">'
+                                  f'<Field key="addedAt" title="Date Added" type="date"/></Type>'
+                                  f'<FieldType type="date"><Operator key="&gt;&gt;=" title="is after"/></FieldType>'
+                                  f'</Meta></MediaContainer>'), {}
+            self.count("all")
+            start = int(headers.get("X-Plex-Container-Start") or 0)
+            size = int(headers.get("X-Plex-Container-Size") or 100)
+            indices = range(lib.size)
+            if "addedAt>>" in query:
+                since = int(query["addedAt>>"][0])
+                indices = range(max(0, (since - lib.added_base) // 60 + 1), lib.size)
+            page = indices[start:start + size]
+            rows = "".join(self.video(section, i, lib) for i in page)
+            return 200, xml, f'<MediaContainer size="{len(page)}" totalSize="{len(indices)}" librarySectionID="{section}">{rows}</MediaContainer>', {}
+        self.count("other")
+        return 404, xml, '<MediaContainer size="0"/>', {}
+
+# --- RADARR / SONARR (v3) ---
+class StubArr(StubServer):
+    def __init__(self, library, flavor="radarr", **kwargs):
+        super().__init__(**kwargs)
+        self.library = library
+        self.name = flavor
+        self.endpoint = "movie" if flavor == "radarr" else "series"
+        self.id_key = "tmdbId" if flavor == "radarr" else "tvdbId"
+        self.added = set()
+
+    def record(self, i, tracked=False):
+        e = self.library.entry(i)
+        rec = {"title": e["title"], "year": e["year"], self.id_key: e["tmdb" if self.id_key == "tmdbId" else "tvdb"],
+               "titleSlug": e["title"].lower().replace(" ", "-")}
+        if tracked: rec["id"] = i + 1
+        return rec
+
+    def handle(self, method, path, query, headers, body):
+        js = "application/json"
+        base = f"/api/v3/{self.endpoint}"
+        size = self.library.size
+        if path == base and method == "GET":
+            self.count("library")
+            return 200, js, json.dumps([self.record(i, True) for i in range(size, size + self.library.arr_owned)]), {}
+        if path == f"{base}/lookup":
+            self.count("lookup")
+            term = (query.get("term") or [""])[0]
+            kind, _, value = term.partition(":")
+            if kind in ("tmdb", "tvdb") and value.isdigit(): i = self.library.index_of({kind: value})
+            else: i = self.library.index_of(title=term.rsplit(" ", 1)[0] if term[-4:].isdigit() else term)
+            # Every third unknown title is missing from the downloader's metadata source
+            if i is None or i % 3 == 2: return 200, js, "[]", {}
+            return 200, js, json.dumps([self.record(i, size <= i < size + self.library.arr_owned)]), {}
+        if path == base and method == "POST":
+            self.count("add")
+            with self.lock: self.added.add(json.loads(body or b"{}").get(self.id_key))
+            return 201, js, body or b"{}", {}
+        self.count("other")
+        return 404, js, "{}", {}
+
+# --- TRAKT ---
+class StubTrakt(StubServer):
+    name = "trakt"
+
+    # A list's id is its length, so one stub serves every list size: /users/bench/lists/5000 has 5000 items
+    def __init__(self, library, **kwargs):
+        super().__init__(**kwargs)
+        self.library = library
+
+    def page(self, total, row, query, headers):
+        page = int((query.get("page") or ["1"])[0])
+        limit = int((query.get("limit") or ["10"])[0])
+        etag = f'"{page}-{limit}-{total}"'
+        extra = {"X-Pagination-Page": str(page), "X-Pagination-Page-Count": str(max(1, -(-total // limit))),
+                 "X-Pagination-Item-Count": str(total), "ETag": etag}
+        if headers.get("If-None-Match") == etag:
+            self.count("not_modified")
+            return 304, "application/json", b"", extra
+        body = [row(n) for n in range((page - 1) * limit, min(total, page * limit))]
+        return 200, "application/json", json.dumps(body), extra
+
+    def list_row(self, n):
+        # Even positions are in Plex, odd ones only in the downloaders
+        e = self.library.entry(n // 2 if n % 2 == 0 else self.library.size + n // 2)
+        kind = self.library.type
+        return {"type": kind, kind: {"title": e["title"], "year": e["year"], "ids": {"tmdb": e["tmdb"], "imdb": e["imdb"], "tvdb": e["tvdb"]}}}
+
+    def handle(self, method, path, query, headers, body):
+        js = "application/json"
+        if path == "/search/list":
+            self.count("search")
+            return self.page(250, lambda n: {"type": "list", "list": {"name": f"Bench List {n}", "likes": n, "item_count": 1000,
+                                                                      "ids": {"trakt": 1000}, "user": {"ids": {"slug": "bench"}}}}, query, headers)
+        parts = path.strip("/").split("/")
+        size = int(parts[3]) if len(parts) >= 4 and parts[3].isdigit() else 0
+        if len(parts) == 4 and parts[0] == "users" and parts[2] == "lists":
+            self.count("summary")
+            return 200, js, json.dumps({"name": f"Bench List {size}", "item_count": size, "updated_at": "2024-01-01T00:00:00.000Z"}), {}
+        if len(parts) == 5 and parts[0] == "users" and parts[4] == "items":
+            self.count("items")
+            return self.page(size, self.list_row, query, headers)
+        self.count("other")
+        return 404, js, "{}", {}
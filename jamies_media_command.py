@@ -1,25 +1,35 @@
 
-import json
-import os
 import threading
 import time
 import tkinter as tk
-from tkinter import ttk, messagebox, Menu
-from urllib.parse import quote_plus
-from difflib import SequenceMatcher
+from tkinter import ttk, messagebox, filedialog, Menu
 
-import requests
 import customtkinter as ctk
-from plexapi.server import PlexServer
 
-# --- CONFIGURATION ---
-CONFIG_FILE = "collection_manager_config.json"
-COLLECTIONS_DATA_FILE = "collections_data.json"
+from media_core import MediaEngine, load_config, save_config, iter_list, iter_import_file, normalize_title
 
 # Set Theme
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+ITEMS_PAGE_SIZE = 500
+LOG_PANE_LINES = 1000
+LOG_FLUSH_MS = 200
+STATS_REFRESH_MS = 2000
+
+def sync_tree(tree, shown, rows):
+    # Brings a Treeview in line with rows ({iid: (values, tags)}, in display order), touching only what differs.
+    # shown mirrors what is on screen and is updated in place.
+    gone = [iid for iid in shown if iid not in rows]
+    if gone: tree.delete(*gone)
+    for iid in gone: del shown[iid]
+    for pos, (iid, row) in enumerate(rows.items()):
+        if iid not in shown: tree.insert("", pos, iid=iid, values=row[0], tags=row[1])
+        elif shown[iid] != row: tree.item(iid, values=row[0], tags=row[1])
+        shown[iid] = row
+    if list(tree.get_children()) != list(rows):
+        for pos, iid in enumerate(rows): tree.move(iid, "", pos)
+
 class PlexManagerPro(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -28,19 +38,23 @@ class PlexManagerPro(ctk.CTk):
         self.title("Jamie's Media Command") 
         self.geometry("1300x850") 
         
-        # Thread Locking & Control
-        self.data_lock = threading.Lock()
-        
-        # Split Cancel Events (Process vs Monitor)
-        self.process_cancel_event = threading.Event()
-        self.monitor_cancel_event = threading.Event()
-        
-        # Concurrency Guard
-        self.monitor_running = threading.Event()
-
-        # Load Data
-        self.config = self.load_config()
-        self.collections_data = self.load_collections_data()
+        # External IDs carried from the last Trakt preview/import, keyed by (normalized title, year)
+        self.trakt_preview_ids = {}
+        self.import_ids = {}
+        self.trakt_token = 0  # bumped per search/preview so pages from a superseded request are dropped
+
+        # Rows currently on screen ({iid: (values, tags)}) so refreshes only touch what changed
+        self.monitor_rows, self.item_rows = {}, {}
+        self.items_col, self.items_page = None, 0
+        self.monitor_refresh_pending = False
+        self.log_cursor = 0  # last engine log line shown in the panes
+
+        # Load Data + Engine (all collection/monitor logic lives in media_core)
+        self.config = load_config()
+        self.engine = MediaEngine(self.config, echo=False,
+                                  on_status=lambda t: self.after(0, self.update_status_label, t),
+                                  on_change=self.schedule_monitor_refresh)
+        self.store = self.engine.store
         self.auto_refresh_active = tk.BooleanVar(value=False)
 
         # Grid Layout
@@ -73,7 +87,16 @@ class PlexManagerPro(ctk.CTk):
 
         # Init
         self.select_frame_by_name("create")
+        self.engine.start_webhook_server()
+        if self.store.jobs(status="open"): self.after(1000, self.start_job_run)
         self.after(60000, self.auto_refresh_loop)
+        self.flush_logs()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        # Stops runs and the webhook server, saves caches and metrics, closes the log file
+        try: self.engine.shutdown()
+        finally: self.destroy()
 
     def create_nav_btn(self, text, command, row):
         btn = ctk.CTkButton(self.sidebar_frame, corner_radius=0, height=40, border_spacing=10, text=text,
@@ -133,6 +156,9 @@ class PlexManagerPro(ctk.CTk):
         self.btn_run = ctk.CTkButton(btn_frame, text="Process Collection", height=40, font=ctk.CTkFont(size=16, weight="bold"), command=self.start_initial_run)
         self.btn_run.pack(side="left", fill="x", expand=True, padx=(0, 10))
         
+        self.btn_import_file = ctk.CTkButton(btn_frame, text="Import File...", height=40, width=140, command=self.start_file_run)
+        self.btn_import_file.pack(side="left", padx=(0, 10))
+
         self.btn_cancel = ctk.CTkButton(btn_frame, text="STOP", height=40, width=80, fg_color="red", hover_color="darkred", state="disabled", command=self.trigger_cancel)
         self.btn_cancel.pack(side="right")
 
@@ -150,12 +176,21 @@ class PlexManagerPro(ctk.CTk):
         controls.pack(fill="x", padx=20, pady=10)
         self.btn_refresh = ctk.CTkButton(controls, text="Refresh Status (Plex Scan)", command=self.refresh_monitor_status)
         self.btn_refresh.pack(side="left", padx=10, pady=10)
-        ctk.CTkCheckBox(controls, text="Auto-scan every 10 mins", variable=self.auto_refresh_active).pack(side="left", padx=20, pady=10)
+        ctk.CTkCheckBox(controls, text="Auto-scan", variable=self.auto_refresh_active).pack(side="left", padx=20, pady=10)
+        self.btn_reconcile = ctk.CTkButton(controls, text="Reconcile All with Plex", command=self.reconcile_all)
+        self.btn_reconcile.pack(side="left", padx=10, pady=10)
         ctk.CTkButton(controls, text="Delete Selected", fg_color="red", hover_color="darkred", command=self.delete_collection_data).pack(side="right", padx=10, pady=10)
+        self.btn_stats = ctk.CTkButton(controls, text="Show Stats", width=110, command=self.toggle_stats)
+        self.btn_stats.pack(side="right", padx=10, pady=10)
 
         # Split View
         paned = tk.PanedWindow(self.frame_monitor, orient=tk.HORIZONTAL, sashwidth=4, bg="#2b2b2b")
         paned.pack(fill="both", expand=True, padx=20, pady=10)
+        self.monitor_paned = paned
+
+        # Live stats (engine metrics), hidden until toggled
+        self.stats_box = ctk.CTkTextbox(self.frame_monitor, height=170, font=("Consolas", 11))
+        self.stats_box.configure(state="disabled")
 
         # Monitor Tree (Left)
         left_frame = ctk.CTkFrame(paned)
@@ -188,6 +223,9 @@ class PlexManagerPro(ctk.CTk):
         # Context Menu
         self.monitor_menu = Menu(self, tearoff=0)
         self.monitor_menu.add_command(label="Force Re-scan This Collection", command=self.force_rescan_single)
+        self.monitor_menu.add_command(label="Retry Failed Items", command=self.retry_failed_single)
+        self.monitor_menu.add_command(label="Reconcile with Plex", command=self.reconcile_single)
+        self.monitor_menu.add_command(label="Unsubscribe from Trakt", command=self.unsubscribe_single)
         self.monitor_tree.bind("<Button-3>", self.show_monitor_context) 
 
         paned.add(left_frame, width=450)
@@ -198,6 +236,12 @@ class PlexManagerPro(ctk.CTk):
         right_header.pack(fill="x", pady=5, padx=5)
         ctk.CTkLabel(right_header, text="Items Detail", font=ctk.CTkFont(weight="bold")).pack(side="left")
         ctk.CTkButton(right_header, text="Copy List", width=100, height=24, command=self.copy_monitor_list).pack(side="right")
+        self.btn_items_next = ctk.CTkButton(right_header, text=">", width=30, height=24, state="disabled", command=lambda: self.step_items_page(1))
+        self.btn_items_next.pack(side="right", padx=(0, 10))
+        self.lbl_items_page = ctk.CTkLabel(right_header, text="")
+        self.lbl_items_page.pack(side="right", padx=5)
+        self.btn_items_prev = ctk.CTkButton(right_header, text="<", width=30, height=24, state="disabled", command=lambda: self.step_items_page(-1))
+        self.btn_items_prev.pack(side="right")
 
         self.items_tree = ttk.Treeview(right_frame, columns=("title", "year", "status"), show="headings")
         self.items_tree.heading("title", text="Title")
@@ -263,7 +307,10 @@ class PlexManagerPro(ctk.CTk):
         self.preview_tree.column("year", width=80)
         self.preview_tree.pack(fill="both", expand=True, padx=5, pady=5)
 
-        ctk.CTkButton(self.frame_trakt, text="IMPORT SELECTED LIST", height=50, font=ctk.CTkFont(size=16, weight="bold"), command=self.import_trakt_list).pack(fill="x", padx=20, pady=20)
+        trakt_btns = ctk.CTkFrame(self.frame_trakt, fg_color="transparent")
+        trakt_btns.pack(fill="x", padx=20, pady=20)
+        ctk.CTkButton(trakt_btns, text="IMPORT SELECTED LIST", height=50, font=ctk.CTkFont(size=16, weight="bold"), command=self.import_trakt_list).pack(side="left", fill="x", expand=True, padx=(0, 10))
+        ctk.CTkButton(trakt_btns, text="SUBSCRIBE (Keep Synced)", height=50, width=220, command=self.subscribe_trakt_list).pack(side="right")
 
     def setup_settings_ui(self):
         ctk.CTkLabel(self.frame_settings, text="Settings", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20, padx=20, anchor="w")
@@ -302,43 +349,65 @@ class PlexManagerPro(ctk.CTk):
 
         add_section("Trakt")
         self.entry_trakt_id = add_field("Client ID:", "trakt_client_id")
+        self.entry_trakt_sync = add_field("Subscription Sync (min):", "trakt_sync_minutes")
+        self.entry_trakt_pages = add_field("Max Pages (100 per page):", "trakt_max_pages")
+
+        add_section("Performance")
+        self.entry_plex_index_ttl = add_field("Plex Index TTL (s):", "plex_index_ttl")
+        self.entry_fuzzy_threshold = add_field("Fuzzy Threshold:", "fuzzy_threshold")
+        self.entry_match_workers = add_field("Plex Match Workers:", "match_workers")
+        self.entry_plex_workers = add_field("Plex Concurrent Requests:", "plex_workers")
+        self.entry_arr_workers = add_field("Radarr/Sonarr Workers:", "arr_workers")
+        self.entry_lookup_cache_ttl = add_field("Lookup Cache TTL (h):", "lookup_cache_ttl_hours")
+        self.entry_full_scan_hours = add_field("Full Re-scan Every (h):", "full_scan_hours")
+        self.entry_auto_scan_minutes = add_field("Auto-scan Every (min):", "auto_scan_minutes")
+        self.entry_recheck_base = add_field("Recheck Backoff Base (min):", "recheck_base_minutes")
+        self.entry_recheck_max = add_field("Recheck Backoff Cap (h):", "recheck_max_hours")
+        self.entry_scan_budget = add_field("Items per Auto-scan:", "scan_budget")
+
+        add_section("Webhooks (Radarr / Sonarr / Plex)")
+        self.entry_webhook_port = add_field("Listen Port:", "webhook_port")
+        self.entry_webhook_token = add_field("Token:", "webhook_token", True)
+        self.entry_webhook_fallback = add_field("Fallback Scan (min):", "webhook_fallback_minutes")
+
+        add_section("Logging")
+        self.entry_log_level = add_field("Level (debug/info/warning/error):", "log_level")
+        self.entry_log_file = add_field("Log File (blank = off):", "log_file")
+        self.entry_log_file_mb = add_field("Rotate At (MB):", "log_file_mb")
+        self.entry_metrics_file = add_field("Metrics File (Prometheus, blank = off):", "metrics_file")
+
+        add_section("Profiling")
+        self.chk_profile = ctk.CTkCheckBox(container, text="Trace each run (Chrome/Perfetto JSON)", onvalue="1", offvalue="0")
+        if self.config.get("profile_enabled") == "1": self.chk_profile.select()
+        self.chk_profile.pack(anchor="w", pady=5)
+        self.entry_profile_sample = add_field("Sample Every (ms, 0 = off):", "profile_sample_ms")
+        self.entry_profile_dir = add_field("Trace Folder:", "profile_dir")
 
         ctk.CTkButton(container, text="Save Configuration", height=40, command=self.save_config).pack(pady=30, fill="x")
 
     # ================= LOGIC =================
     
-    def log(self, msg):
-        timestamp = time.strftime("[%H:%M:%S] ")
-        full = timestamp + msg + "\n"
-        def _append(widget):
-            try:
-                widget.configure(state='normal')
-                widget.insert(tk.END, full)
-                widget.see(tk.END)
-                widget.configure(state='disabled')
-            except Exception as e: print(f"Log Error: {e}")
-        self.after(0, _append, self.log_create)
-        self.after(0, _append, self.log_monitor)
-
-    def load_config(self):
-        default = {"plex_url": "http://127.0.0.1:32400", "plex_token": "", "plex_movie_lib": "Movies", "plex_tv_lib": "TV Shows",
-                   "radarr_url": "http://127.0.0.1:7878", "radarr_key": "", "radarr_root": "/movies", "radarr_profile": "1",
-                   "sonarr_url": "http://127.0.0.1:8989", "sonarr_key": "", "sonarr_root": "/tv", "sonarr_profile": "1", "trakt_client_id": ""}
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, 'r') as f: return {**default, **json.load(f)}
-            except Exception as e: print(f"Config Error: {e}")
-        return default
-
-    def load_collections_data(self):
-        if os.path.exists(COLLECTIONS_DATA_FILE):
-            try:
-                with open(COLLECTIONS_DATA_FILE, 'r') as f:
-                    data = json.load(f)
-                if "_schema" not in data: data["_schema"] = {"version": 1}
-                return data
-            except Exception as e: print(f"Data Error: {e}")
-        return {"_schema": {"version": 1}}
+    def log(self, msg, level=None):
+        # Safe from any thread: lines land in the engine's ring buffer and reach the panes on the next flush
+        self.engine.log(msg, level)
+
+    def flush_logs(self):
+        # One batched insert per pane per tick, however many lines arrived; panes keep the last LOG_PANE_LINES
+        start = time.perf_counter()
+        self.log_cursor, lines, dropped = self.engine.logs.since(self.log_cursor, LOG_PANE_LINES)
+        if lines:
+            text = (f"... {dropped} earlier lines not shown ...\n" if dropped else "") + "\n".join(lines) + "\n"
+            for widget in (self.log_create, self.log_monitor):
+                try:
+                    widget.configure(state='normal')
+                    widget.insert(tk.END, text)
+                    excess = int(widget.index("end-1c").split(".")[0]) - 1 - LOG_PANE_LINES
+                    if excess > 0: widget.delete("1.0", f"{excess + 1}.0")
+                    widget.see(tk.END)
+                    widget.configure(state='disabled')
+                except Exception as e: print(f"Log Error: {e}")
+            self.engine.profiler.complete("ui.flush_logs", "ui", start, lines=len(lines))
+        self.after(LOG_FLUSH_MS, self.flush_logs)
 
     def save_config(self):
         for key, entry in {
@@ -348,212 +417,78 @@ class PlexManagerPro(ctk.CTk):
             "radarr_root": self.entry_radarr_root, "radarr_profile": self.entry_radarr_profile,
             "sonarr_url": self.entry_sonarr_url, "sonarr_key": self.entry_sonarr_key,
             "sonarr_root": self.entry_sonarr_root, "sonarr_profile": self.entry_sonarr_profile,
-            "trakt_client_id": self.entry_trakt_id
+            "trakt_client_id": self.entry_trakt_id, "plex_index_ttl": self.entry_plex_index_ttl,
+            "fuzzy_threshold": self.entry_fuzzy_threshold, "arr_workers": self.entry_arr_workers,
+            "match_workers": self.entry_match_workers, "plex_workers": self.entry_plex_workers,
+            "lookup_cache_ttl_hours": self.entry_lookup_cache_ttl,
+            "full_scan_hours": self.entry_full_scan_hours, "auto_scan_minutes": self.entry_auto_scan_minutes,
+            "webhook_port": self.entry_webhook_port, "webhook_token": self.entry_webhook_token,
+            "webhook_fallback_minutes": self.entry_webhook_fallback, "recheck_base_minutes": self.entry_recheck_base,
+            "recheck_max_hours": self.entry_recheck_max, "scan_budget": self.entry_scan_budget,
+            "trakt_sync_minutes": self.entry_trakt_sync, "trakt_max_pages": self.entry_trakt_pages,
+            "log_level": self.entry_log_level, "log_file": self.entry_log_file, "log_file_mb": self.entry_log_file_mb,
+            "metrics_file": self.entry_metrics_file, "profile_enabled": self.chk_profile,
+            "profile_sample_ms": self.entry_profile_sample, "profile_dir": self.entry_profile_dir
         }.items():
             self.config[key] = entry.get()
-        with open(CONFIG_FILE, 'w') as f: json.dump(self.config, f, indent=4)
+        save_config(self.config)
+        self.engine.apply_config()
         messagebox.showinfo("Saved", "Configuration saved!")
 
-    def save_collections_data(self):
-        with self.data_lock:
-            with open(COLLECTIONS_DATA_FILE, 'w') as f: json.dump(self.collections_data, f, indent=4)
-
     def trigger_cancel(self):
-        self.process_cancel_event.set() # Only cancel processing, not monitoring
+        self.engine.process_cancel_event.set() # Only cancel processing (and a running Trakt sync), not monitoring
+        self.engine.sync_cancel_event.set()
         self.log("Stopping... please wait for current item.")
         self.btn_cancel.configure(state="disabled", text="Stopping...")
 
     def update_status_label(self, text):
         self.lbl_status.configure(text=text)
 
-    def get_plex_lib(self, m_type: str):
-        try:
-            plex = PlexServer(self.config['plex_url'], self.config['plex_token'])
-            section_name = self.config['plex_movie_lib'] if m_type == "movie" else self.config['plex_tv_lib']
-            return plex.library.section(section_name)
-        except Exception as e:
-            self.log(f"[Plex] Error: {e}")
-            return None
-
     # --- PROCESS LOGIC ---
-    def start_initial_run(self):
+    def start_initial_run(self, path=None):
         self.btn_run.configure(state="disabled")
+        self.btn_import_file.configure(state="disabled")
         self.btn_cancel.configure(state="normal", text="STOP")
-        self.process_cancel_event.clear()
-        threading.Thread(target=self.run_process, daemon=True).start()
+        self.engine.process_cancel_event.clear()
+        threading.Thread(target=self.run_process, args=(path,), daemon=True).start()
+
+    def start_file_run(self):
+        # Large exports stream straight from disk into the pipeline instead of through the text box
+        if not self.entry_col_name.get().strip():
+            messagebox.showwarning("Import File", "Enter a collection name first.")
+            return
+        path = filedialog.askopenfilename(title="Import list file", filetypes=[("List exports", "*.csv *.tsv *.json *.jsonl *.txt"), ("All files", "*.*")])
+        if path: self.start_initial_run(path)
 
-    def run_process(self):
+    def run_process(self, path=None):
         try:
             col = self.entry_col_name.get().strip()
             m_type = self.var_media_type.get()
-            raw = self.text_movie_list.get("1.0", tk.END).strip().split('\n')
-            
-            items = []
-            for line in raw:
-                line = line.strip()
-                if line and '(' in line and line.endswith(')'):
-                    try:
-                        p = line.rsplit('(', 1)
-                        items.append({"title": p[0].strip(), "year": int(p[1].replace(')', '')), "found": False})
-                    except (ValueError, TypeError) as e:
-                        self.log(f"Skipping malformed line: '{line}' ({e})")
-            
-            if not col or not items: 
-                self.log("Error: Missing Name or valid items.")
-                return
-
-            items_to_scan = [] 
-
-            with self.data_lock:
-                if col in self.collections_data:
-                    existing = self.collections_data[col]
-                    if existing.get("type") != m_type:
-                        self.log(f"[ERROR] Mismatch! '{col}' is {existing.get('type')}. Cannot add {m_type}.")
-                        return 
-                    existing_items = existing['items']
-                    existing_keys = set((i['title'].lower(), i['year']) for i in existing_items)
-                    added_count = 0
-                    for new_item in items:
-                        if (new_item['title'].lower(), new_item['year']) not in existing_keys:
-                            existing_items.append(new_item)
-                            items_to_scan.append(new_item)
-                            added_count += 1
-                    self.log(f"Merging: Added {added_count} new items.")
-                else:
-                    self.collections_data[col] = {"type": m_type, "items": items}
-                    items_to_scan = items
-                    self.log(f"Created '{col}' with {len(items)} items.")
-
-            self.save_collections_data()
-            self.after(0, self.update_monitor_ui)
-            
-            if not items_to_scan:
-                self.log("No new items to process.")
-                return
-
-            self.log(f"Processing {len(items_to_scan)} items...")
-            
-            lib = self.get_plex_lib(m_type)
-            if not lib: return
-            
-            misses = []
-            total = len(items_to_scan)
-
-            for i, item in enumerate(items_to_scan):
-                if self.process_cancel_event.is_set(): break
-                if item['found']: continue
-
-                self.after(0, lambda t=f"Processing {i+1} / {total}...": self.update_status_label(t))
-                
-                # Network check outside lock
-                found = self.find_plex(lib, item['title'], item['year'])
-                
-                if found:
-                    try: found.addCollection(col)
-                    except Exception as e:
-                        self.log(f"Plex tag error {item['title']}: {e}")
-                        continue 
-
-                with self.data_lock:
-                    if found:
-                        item['found'] = True
-                        self.log(f" -> Found: {item['title']}")
-                    else:
-                        item['found'] = False
-                        misses.append(item)
-            
-            self.save_collections_data()
-            self.after(0, self.update_monitor_ui)
-            self.after(0, lambda: self.update_status_label("Ready"))
-            
-            if misses and not self.process_cancel_event.is_set():
-                self.log(f"Sending {len(misses)} missing items to downloader...")
-                if m_type == "movie": self.process_radarr(misses)
-                else: self.process_sonarr(misses)
-            
-            if self.process_cancel_event.is_set(): self.log("Operation Cancelled.")
-            else: self.log("Complete.")
-            
-        except Exception as e: self.log(f"Process Error: {e}")
+            if path: items = iter_import_file(path, m_type, self.import_ids, self.log)
+            else: items = iter_list(self.text_movie_list.get("1.0", tk.END).strip().split('\n'), self.import_ids, self.log)
+            self.engine.run_process(col, m_type, items)
         finally: 
             self.after(0, lambda: self.btn_run.configure(state="normal"))
+            self.after(0, lambda: self.btn_import_file.configure(state="normal"))
             self.after(0, lambda: self.btn_cancel.configure(state="disabled"))
 
-    # --- FUZZY SEARCH ---
-    def find_plex(self, lib, title, year):
+    def start_job_run(self, retry_col=None):
+        # Resumes unfinished jobs (or retries one collection's failed items) with the same STOP handling as a run
+        if str(self.btn_run.cget("state")) == "disabled": return
+        self.btn_run.configure(state="disabled")
+        self.btn_import_file.configure(state="disabled")
+        self.btn_cancel.configure(state="normal", text="STOP")
+        self.engine.process_cancel_event.clear()
+        threading.Thread(target=self.run_jobs, args=(retry_col,), daemon=True).start()
+
+    def run_jobs(self, retry_col=None):
         try:
-            results = lib.search(title=title)
-            for m in results:
-                if hasattr(m, 'year') and m.year == year and m.title.lower() == title.lower(): return m
-            for m in results:
-                if m.title.lower() == title.lower(): return m
-            for m in results:
-                if hasattr(m, 'year') and m.year == year:
-                    ratio = SequenceMatcher(None, m.title.lower(), title.lower()).ratio()
-                    if ratio > 0.9: 
-                        self.log(f"[Fuzzy Match] '{title}' -> '{m.title}' ({ratio:.2f})")
-                        return m
-            return None
-        except Exception as e:
-            self.log(f"Search Error: {e}")
-            return None
-
-    def process_radarr(self, misses):
-        url = (self.config.get('radarr_url') or '').rstrip('/')
-        head = {"X-Api-Key": self.config.get('radarr_key') or ''}
-        if not url: return
-        
-        for m in misses:
-            if self.process_cancel_event.is_set(): break
-            try:
-                resp = requests.get(f"{url}/api/v3/movie/lookup?term={quote_plus(m['title'] + ' ' + str(m['year']))}", headers=head, timeout=15)
-                if resp.status_code != 200:
-                    self.log(f"[Radarr Error] Lookup failed: {resp.status_code}")
-                    continue
-                look = resp.json()
-                if not look: 
-                    self.log(f"  [Radarr Miss] {m['title']}")
-                    continue
-                c = next((x for x in look if x.get('year') == m['year']), look[0])
-                if c.get("id"): 
-                    self.log(f"  [Radarr Skip] {m['title']}")
-                    continue
-                pl = {"tmdbId": c.get("tmdbId"), "title": c.get("title"), "year": c.get("year"), "qualityProfileId": int(self.config['radarr_profile']), "rootFolderPath": self.config['radarr_root'], "monitored": True, "addOptions": {"searchForMovie": True}}
-                
-                resp = requests.post(f"{url}/api/v3/movie", headers=head, json=pl, timeout=15)
-                if resp.status_code == 201:
-                    self.log(f"  [Radarr Added] {m['title']}")
-                else:
-                    self.log(f"  [Radarr Error] {m['title']} ({resp.status_code}: {resp.text[:100]})")
-            except Exception as e: self.log(f"Radarr Error: {e}")
-
-    def process_sonarr(self, misses):
-        url = (self.config.get('sonarr_url') or '').rstrip('/')
-        head = {"X-Api-Key": self.config.get('sonarr_key') or ''}
-        if not url: return
-
-        for s in misses:
-            if self.process_cancel_event.is_set(): break
-            try:
-                resp = requests.get(f"{url}/api/v3/series/lookup?term={quote_plus(s['title'])}", headers=head, timeout=15)
-                if resp.status_code != 200:
-                    self.log(f"[Sonarr Error] Lookup failed: {resp.status_code}")
-                    continue
-                look = resp.json()
-                if not look: 
-                    self.log(f"  [Sonarr Miss] {s['title']}")
-                    continue
-                c = next((x for x in look if x.get('year') == s['year']), look[0])
-                if c.get("id"): 
-                    self.log(f"  [Sonarr Skip] {s['title']}")
-                    continue
-                pl = {"tvdbId": c.get("tvdbId"), "title": c.get("title"), "titleSlug": c.get("titleSlug"), "qualityProfileId": int(self.config['sonarr_profile']), "rootFolderPath": self.config['sonarr_root'], "monitored": True, "addOptions": {"searchForMissingEpisodes": True}}
-                resp = requests.post(f"{url}/api/v3/series", headers=head, json=pl, timeout=15)
-                if resp.status_code == 201:
-                    self.log(f"  [Sonarr Added] {s['title']}")
-                else:
-                    self.log(f"  [Sonarr Error] {s['title']} ({resp.status_code}: {resp.text[:100]})")
-            except Exception as e: self.log(f"Sonarr Error: {e}")
+            if retry_col: self.engine.retry_failed(retry_col)
+            else: self.engine.resume_jobs()
+        finally:
+            self.after(0, lambda: self.btn_run.configure(state="normal"))
+            self.after(0, lambda: self.btn_import_file.configure(state="normal"))
+            self.after(0, lambda: self.btn_cancel.configure(state="disabled"))
 
     # --- MONITOR EXTRAS ---
     def show_monitor_context(self, event):
@@ -565,100 +500,156 @@ class PlexManagerPro(ctk.CTk):
     def force_rescan_single(self):
         sel = self.monitor_tree.selection()
         if not sel: return
-        self.monitor_cancel_event.clear()
-        col_name = self.monitor_tree.item(sel[0])['values'][0]
+        self.engine.monitor_cancel_event.clear()
+        col_name = sel[0]
         self.monitor_tree.item(sel[0], tags=("scanning",))
         self.monitor_tree.tag_configure("scanning", background="#004400")
+        # Keep the diff cache in step so the next refresh clears the highlight even if nothing changed
+        if col_name in self.monitor_rows: self.monitor_rows[col_name] = (self.monitor_rows[col_name][0], ("scanning",))
         self.log(f"Forcing re-scan for '{col_name}'...")
+        self.engine.invalidate_plex_index()
         threading.Thread(target=self.run_monitor, args=(col_name,), daemon=True).start()
 
-    def refresh_monitor_status(self): 
-        self.monitor_cancel_event.clear()
+    def retry_failed_single(self):
+        sel = self.monitor_tree.selection()
+        if not sel: return
+        col_name = sel[0]
+        self.log(f"Retrying failed items for '{col_name}'...")
+        self.start_job_run(col_name)
+
+    def unsubscribe_single(self):
+        sel = self.monitor_tree.selection()
+        if sel: self.engine.unsubscribe_trakt(sel[0])
+
+    def reconcile_single(self):
+        sel = self.monitor_tree.selection()
+        if sel: self.start_reconcile({sel[0]})
+
+    def reconcile_all(self):
+        self.start_reconcile(None)
+
+    def start_reconcile(self, names):
+        # Dry run first, then apply the adds/removes only after the user confirms the counts
+        if str(self.btn_reconcile.cget("state")) == "disabled": return
+        self.btn_reconcile.configure(state="disabled")
+        self.engine.monitor_cancel_event.clear()
+
+        def _apply(plan):
+            if not any(plan.values()): self.log("Plex collections already match.")
+            elif messagebox.askyesno("Reconcile", f"Reconcile {repr(next(iter(names))) if names else 'all collections'} with Plex?\n\n"
+                                                  f"Add {plan['added']} and remove {plan['removed']} collection members, "
+                                                  f"mark {plan['found']} items found and {plan['lost']} as no longer in Plex."):
+                threading.Thread(target=self.run_reconcile, args=(names,), daemon=True).start()
+                return
+            self.btn_reconcile.configure(state="normal")
+
+        def _plan():
+            try: plan = self.engine.reconcile_collections(names, dry_run=True)
+            except Exception as e:
+                self.log(f"Reconcile Error: {e}")
+                plan = {"added": 0, "removed": 0, "found": 0, "lost": 0}
+            self.after(0, lambda: _apply(plan))
+        threading.Thread(target=_plan, daemon=True).start()
+
+    def run_reconcile(self, names):
+        try: self.engine.reconcile_collections(names)
+        finally: self.after(0, lambda: self.btn_reconcile.configure(state="normal"))
+
+    def refresh_monitor_status(self, manual=True): 
+        if manual: self.engine.invalidate_plex_index()
+        self.engine.monitor_cancel_event.clear()
         self.btn_refresh.configure(state="disabled")
-        threading.Thread(target=self.run_monitor, daemon=True).start()
-    
-    def run_monitor(self, target_col=None):
-        if self.monitor_running.is_set():
-            self.log("Monitor already running; skipping.")
-            return
-        
-        self.monitor_running.set()
-        try:
-            self.log("Scanning Plex...")
-            plex = PlexServer(self.config['plex_url'], self.config['plex_token'])
-            mlib = plex.library.section(self.config['plex_movie_lib'])
-            tlib = plex.library.section(self.config['plex_tv_lib'])
-            
-            with self.data_lock:
-                to_scan = [(k,v) for k,v in self.collections_data.items() if not k.startswith('_') and (target_col is None or k == target_col)]
-
-            for name, data in to_scan:
-                if self.monitor_cancel_event.is_set(): break
-                lib = mlib if data['type'] == 'movie' else tlib
-                for item in data['items']:
-                    if self.monitor_cancel_event.is_set(): break
-                    if not item['found']:
-                        f = self.find_plex(lib, item['title'], item['year'])
-                        
-                        if f:
-                            try: f.addCollection(name)
-                            except Exception as e: 
-                                self.log(f"Tag error: {e}"); continue
-                            
-                            with self.data_lock:
-                                item['found'] = True
-                                self.log(f"New Arrival: {item['title']}")
-            
-            self.save_collections_data()
-            self.after(0, self.update_monitor_ui)
-            self.log("Scan complete.")
-        except Exception as e: self.log(f"Monitor Error: {e}")
-        finally: 
-            self.monitor_running.clear()
+        threading.Thread(target=self.run_monitor, kwargs={"incremental": not manual}, daemon=True).start()
+
+    def run_monitor(self, target_col=None, incremental=False):
+        try: self.engine.run_monitor(target_col, incremental)
+        finally:
             self.after(0, lambda: self.btn_refresh.configure(state="normal"))
+            self.after(0, self.schedule_monitor_refresh)  # also when the scan failed, so a "scanning" highlight is cleared
 
     # --- BOILERPLATE ---
+    def schedule_monitor_refresh(self):
+        # Engine changes arrive in bursts from worker threads; coalesce them into one redraw
+        if self.monitor_refresh_pending: return
+        self.monitor_refresh_pending = True
+        self.after(250, self.update_monitor_ui)
+
     def update_monitor_ui(self):
-        for i in self.monitor_tree.get_children(): self.monitor_tree.delete(i)
-        with self.data_lock:
-            for n, d in self.collections_data.items():
-                if n.startswith("_"): continue
-                tot = len(d['items'])
-                fnd = sum(1 for x in d['items'] if x['found'])
-                perc = int((fnd/tot)*100) if tot else 0
-                self.monitor_tree.insert("", tk.END, values=(n, d['type'], f"{fnd} / {tot} ({perc}%)"))
+        self.monitor_refresh_pending = False
+        start = time.perf_counter()
+        rows = {n: ((n, m_type, f"{fnd} / {tot} ({int((fnd/tot)*100) if tot else 0}%)"), ()) for n, m_type, fnd, tot in self.store.summaries()}
+        sync_tree(self.monitor_tree, self.monitor_rows, rows)
+        if self.items_col is not None: self.update_items_ui()
+        self.engine.profiler.complete("ui.update_monitor", "ui", start, rows=len(rows))
 
     def on_monitor_select(self, event):
         sel = self.monitor_tree.selection()
-        if not sel: return
-        col = self.monitor_tree.item(sel[0])['values'][0]
-        for i in self.items_tree.get_children(): self.items_tree.delete(i)
-        with self.data_lock:
-            for item in self.collections_data.get(col, {}).get('items', []):
-                status = "Complete" if item['found'] else "Pending"
-                tag = "complete" if item['found'] else "pending"
-                self.items_tree.insert("", tk.END, values=(item['title'], item['year'], status), tags=(tag,))
+        if not sel or sel[0] == self.items_col: return
+        self.items_col, self.items_page = sel[0], 0
+        self.update_items_ui()
+        self.items_tree.yview_moveto(0)
+
+    def toggle_stats(self):
+        if self.stats_box.winfo_ismapped():
+            self.stats_box.pack_forget()
+            self.btn_stats.configure(text="Show Stats")
+        else:
+            self.stats_box.pack(fill="x", padx=20, pady=(0, 10), before=self.monitor_paned)
+            self.btn_stats.configure(text="Hide Stats")
+            self.refresh_stats()
+
+    def refresh_stats(self):
+        if not self.stats_box.winfo_ismapped(): return
+        lines = self.engine.metrics.summary_lines() or ["No activity yet."]
+        self.stats_box.configure(state="normal")
+        self.stats_box.delete("1.0", tk.END)
+        self.stats_box.insert("1.0", "\n".join(lines))
+        self.stats_box.configure(state="disabled")
+        self.after(STATS_REFRESH_MS, self.refresh_stats)
+
+    def step_items_page(self, step):
+        self.items_page = max(0, self.items_page + step)
+        self.update_items_ui()
+        self.items_tree.yview_moveto(0)
+
+    def update_items_ui(self):
+        # Shows one page of the selected collection; only rows whose status changed are redrawn
+        start = time.perf_counter()
+        counts = self.store.collection_counts(self.items_col) if self.items_col is not None else None
+        total, rows = counts[1] if counts else 0, {}
+        if counts:
+            self.items_page = min(self.items_page, max(0, (total - 1) // ITEMS_PAGE_SIZE))
+            for item in self.store.items(self.items_col, limit=ITEMS_PAGE_SIZE, offset=self.items_page * ITEMS_PAGE_SIZE):
+                status = "Complete" if item['found'] else "Pending" + (f" ({item['last_seen_state'].replace('_', ' ')})" if item.get('last_seen_state') else "")
+                rows[str(item['id'])] = ((item['title'], item['year'], status), ("complete" if item['found'] else "pending",))
+        else: self.items_col = None
+        sync_tree(self.items_tree, self.item_rows, rows)
+        first = self.items_page * ITEMS_PAGE_SIZE
+        self.lbl_items_page.configure(text=f"{first + 1}-{first + len(rows)} of {total}" if total > ITEMS_PAGE_SIZE else "")
+        self.btn_items_prev.configure(state="normal" if self.items_page > 0 else "disabled")
+        self.btn_items_next.configure(state="normal" if first + len(rows) < total else "disabled")
+        self.engine.profiler.complete("ui.update_items", "ui", start, rows=len(rows))
 
     def copy_monitor_list(self):
         sel = self.monitor_tree.selection()
         if not sel: return
-        col = self.monitor_tree.item(sel[0])['values'][0]
-        with self.data_lock: items = self.collections_data.get(col, {}).get('items', [])
+        col = sel[0]
+        items = self.store.items(col)
         text = f"Collection: {col}\n" + "\n".join([f"{'[FOUND]' if i['found'] else '[MISSING]'} {i['title']} ({i['year']})" for i in items])
         self.clipboard_clear(); self.clipboard_append(text); messagebox.showinfo("Copied", "Copied to clipboard.")
 
     def delete_collection_data(self):
         sel = self.monitor_tree.selection()
         if not sel: return
-        n = self.monitor_tree.item(sel[0])['values'][0]
+        n = sel[0]
         if messagebox.askyesno("Delete", f"Stop monitoring '{n}'?"):
-            with self.data_lock: del self.collections_data[n]
-            self.save_collections_data(); self.update_monitor_ui(); 
-            for i in self.items_tree.get_children(): self.items_tree.delete(i)
+            with self.engine.data_lock: self.store.delete_collection(n)
+            self.update_monitor_ui()
 
     def auto_refresh_loop(self):
-        if self.auto_refresh_active.get(): self.refresh_monitor_status()
-        self.after(600000, self.auto_refresh_loop)
+        if self.auto_refresh_active.get(): self.refresh_monitor_status(manual=False)
+        if self.engine.sync_due(): threading.Thread(target=self.engine.sync_trakt_subscriptions, daemon=True).start()
+        self.after(int(self.engine.poll_interval_minutes() * 60000), self.auto_refresh_loop)
 
     # --- TRAKT SEARCH (Thread Safe) ---
     def search_trakt(self):
@@ -666,20 +657,14 @@ class PlexManagerPro(ctk.CTk):
         client_id = self.config.get("trakt_client_id")
         if not query or not client_id: return
         for i in self.trakt_tree.get_children(): self.trakt_tree.delete(i)
-        
+        self.trakt_token += 1
+        token = self.trakt_token
+
+        def _add_rows(rows):
+            if token == self.trakt_token: self.after(0, lambda: [self.trakt_tree.insert("", tk.END, values=r) for r in rows])
+
         def _search():
-            try:
-                url = f"https://api.trakt.tv/search/list?query={quote_plus(query)}"
-                resp = requests.get(url, headers={"Content-Type": "application/json", "trakt-api-version": "2", "trakt-api-key": client_id}, timeout=15)
-                if resp.status_code != 200:
-                    self.log(f"Trakt Search Error: {resp.status_code}")
-                    return
-                data = resp.json()
-                rows = []
-                for item in data:
-                    lst = item.get("list", {})
-                    rows.append((lst.get("name"), lst.get("likes", 0), lst.get("item_count"), f"{lst.get('user', {}).get('ids', {}).get('slug')}|{lst.get('ids', {}).get('trakt')}"))
-                self.after(0, lambda: [self.trakt_tree.insert("", tk.END, values=r) for r in rows])
+            try: self.engine.trakt_search(query, on_rows=_add_rows)
             except Exception as e: self.log(f"Trakt Error: {e}")
         threading.Thread(target=_search, daemon=True).start()
 
@@ -688,28 +673,20 @@ class PlexManagerPro(ctk.CTk):
         if not sel: return
         comp = self.trakt_tree.item(sel[0])['values'][3]
         for i in self.preview_tree.get_children(): self.preview_tree.delete(i)
-        threading.Thread(target=self.load_trakt_preview, args=(comp,), daemon=True).start()
+        self.trakt_preview_ids = {}
+        self.trakt_token += 1
+        threading.Thread(target=self.load_trakt_preview, args=(comp, self.trakt_token), daemon=True).start()
 
-    def load_trakt_preview(self, comp):
+    def load_trakt_preview(self, comp, token):
         u, l_id = comp.split("|")
-        cid = self.config.get("trakt_client_id")
-        try:
-            url = f"https://api.trakt.tv/users/{u}/lists/{l_id}/items"
-            resp = requests.get(url, headers={"Content-Type": "application/json", "trakt-api-version": "2", "trakt-api-key": cid}, timeout=15)
-            if resp.status_code != 200:
-                self.log(f"Trakt Preview Error: {resp.status_code}")
-                return
-            data = resp.json()
-            items = []
-            w_type = self.var_trakt_type.get()
-            for e in data:
-                if w_type == "movie" and e.get("type") == "movie":
-                    m = e.get("movie", {})
-                    if m.get("title") and m.get("year"): items.append((m['title'], m['year']))
-                elif w_type == "show" and e.get("type") == "show":
-                    s = e.get("show", {})
-                    if s.get("title") and s.get("year"): items.append((s['title'], s['year']))
-            self.after(0, lambda: [self.preview_tree.insert("", tk.END, values=i) for i in items])
+
+        def _add_page(items):
+            # Rows appear page by page while the rest of the list downloads
+            if token != self.trakt_token: return
+            self.trakt_preview_ids.update({(normalize_title(t), y): ids for t, y, ids in items})
+            self.after(0, lambda: [self.preview_tree.insert("", tk.END, values=(t, y)) for t, y, _ in items])
+
+        try: self.engine.trakt_list_items(u, l_id, self.var_trakt_type.get(), on_page=_add_page)
         except Exception as e: self.log(f"Trakt Preview Exception: {e}")
 
     def import_trakt_list(self):
@@ -717,9 +694,22 @@ class PlexManagerPro(ctk.CTk):
         if not items: return
         sel = self.trakt_tree.selection()
         if sel: self.entry_col_name.delete(0, tk.END); self.entry_col_name.insert(0, self.trakt_tree.item(sel[0])['values'][0])
+        self.import_ids = {k: v for k, v in self.trakt_preview_ids.items() if v}
         self.text_movie_list.delete("1.0", tk.END); self.text_movie_list.insert("1.0", "\n".join(items))
         self.var_media_type.set(self.var_trakt_type.get()); self.show_create()
 
+    def subscribe_trakt_list(self):
+        sel = self.trakt_tree.selection()
+        if not sel: return
+        name, _, _, comp = self.trakt_tree.item(sel[0])['values'][:4]
+        u, l_id = str(comp).split("|")
+        m_type = self.var_trakt_type.get()
+
+        def _subscribe():
+            col = self.engine.subscribe_trakt(u, l_id, m_type, str(name))
+            if col: self.engine.sync_trakt_subscriptions(force=True, names={col})
+        threading.Thread(target=_subscribe, daemon=True).start()
+
 if __name__ == "__main__":
     app = PlexManagerPro()
     app.mainloop()
\ No newline at end of file
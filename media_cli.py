@@ -0,0 +1,136 @@
+import argparse
+import signal
+import sys
+import threading
+
+from media_core import MediaEngine, iter_list, iter_import_file, IMPORT_FORMATS, LOG_LEVELS
+
+# Headless entry point: never imports tkinter/customtkinter, so it runs on a server under systemd.
+#   python media_cli.py --headless                          monitor daemon (scheduler + webhooks)
+#   python media_cli.py process "90s Action" --type movie --file list.txt|export.csv|export.json
+#   python media_cli.py scan [--collection NAME] [--incremental]
+#   python media_cli.py import-trakt <user> <list_id> --type movie [--name NAME]
+#   python media_cli.py jobs | resume | retry-failed [--collection NAME]
+#   python media_cli.py subscribe <user> <list_id> --type movie [--name NAME] | unsubscribe NAME | sync-trakt [--force]
+#   python media_cli.py reconcile [--collection NAME] [--dry-run]
+#   python media_cli.py --profile [--profile-sample-ms 5] process ...   trace the run (profiles/*.trace.json)
+
+def run_daemon(engine, stop):
+    engine.start_webhook_server()
+    engine.log("Headless monitor started.")
+    threading.Thread(target=engine.resume_jobs, daemon=True).start()
+    while not stop.is_set():
+        engine.monitor_cancel_event.clear()
+        if engine.sync_due(): engine.sync_trakt_subscriptions()
+        engine.run_monitor(incremental=True)
+        stop.wait(engine.poll_interval_minutes() * 60)
+    engine.log("Headless monitor stopped.")
+
+def run_process(engine, args):
+    if args.file and args.file != "-":
+        engine.run_process(args.name, args.type, iter_import_file(args.file, args.type, log=engine.log, fmt=args.format))
+    else:
+        engine.run_process(args.name, args.type, iter_list(sys.stdin, log=engine.log))
+
+def run_import_trakt(engine, args):
+    items = engine.trakt_list_items(args.user, args.list_id, args.type)
+    if items is None: return 1
+    name = args.name or engine.trakt_list_name(args.user, args.list_id) or f"{args.user}/{args.list_id}"
+    engine.log(f"Trakt list '{name}': {len(items)} {args.type} items.")
+    engine.run_process(name, args.type, [{"title": t, "year": y, "found": False, **({"ids": ids} if ids else {})} for t, y, ids in items])
+    return 0
+
+def list_jobs(engine):
+    for job_id, col, m_type, status, created, stages in engine.store.jobs():
+        counts = ", ".join(f"{k} {v}" for k, v in sorted(stages.items()))
+        print(f"#{job_id:<5} {status:<5} {m_type:<5} {col} ({counts or 'empty'})")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="media_cli.py", description="Jamie's Media Command (headless)")
+    parser.add_argument("--headless", action="store_true", help="run the monitor scheduler and webhook listener until stopped")
+    parser.add_argument("--log-level", choices=tuple(LOG_LEVELS), help="override the configured log level ('info' hides per-item lines)")
+    parser.add_argument("--profile", action="store_true", help="write a Chrome/Perfetto trace of each run into profile_dir")
+    parser.add_argument("--profile-sample-ms", type=float, metavar="MS", help="with --profile, also sample all threads every MS for a profile summary")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("process", help="create/merge a collection from a 'Title (Year)' list and process it")
+    p.add_argument("name", help="collection name")
+    p.add_argument("--type", choices=("movie", "show"), default="movie")
+    p.add_argument("--file", help="list file: 'Title (Year)' text, CSV, JSON, Letterboxd or IMDb export ('-' or omitted reads stdin)")
+    p.add_argument("--format", choices=IMPORT_FORMATS, help="override format detection")
+
+    p = sub.add_parser("scan", help="run one monitor scan")
+    p.add_argument("--collection", help="only scan this collection")
+    p.add_argument("--incremental", action="store_true", help="only check items Plex added since the last scan")
+
+    p = sub.add_parser("import-trakt", help="import a Trakt list as a collection and process it")
+    p.add_argument("user", help="Trakt user slug")
+    p.add_argument("list_id", help="Trakt list id or slug")
+    p.add_argument("--type", choices=("movie", "show"), default="movie")
+    p.add_argument("--name", help="collection name (defaults to the list name)")
+
+    sub.add_parser("jobs", help="list process jobs and their per-stage item counts")
+    sub.add_parser("resume", help="resume unfinished process jobs")
+
+    p = sub.add_parser("subscribe", help="follow a Trakt list; syncs add/remove changes into its collection")
+    p.add_argument("user", help="Trakt user slug")
+    p.add_argument("list_id", help="Trakt list id or slug")
+    p.add_argument("--type", choices=("movie", "show"), default="movie")
+    p.add_argument("--name", help="collection name (defaults to the list name)")
+    p = sub.add_parser("unsubscribe", help="stop syncing a collection's Trakt list")
+    p.add_argument("name", help="collection name")
+    p = sub.add_parser("sync-trakt", help="sync subscribed Trakt lists that are due")
+    p.add_argument("--force", action="store_true", help="sync every subscription now")
+
+    p = sub.add_parser("reconcile", help="diff Plex collection members against the lists and apply the adds/removes in bulk")
+    p.add_argument("--collection", help="only reconcile this collection")
+    p.add_argument("--dry-run", action="store_true", help="only report what would change")
+
+    p = sub.add_parser("retry-failed", help="re-run only the items that failed (tag or downloader errors)")
+    p.add_argument("--collection", help="only retry this collection's jobs")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.headless and not args.command:
+        parser.print_help()
+        return 2
+
+    engine = MediaEngine()
+    if args.log_level:
+        engine.config['log_level'] = args.log_level
+        engine.logs.configure(engine.config)
+    if args.profile:
+        engine.config['profile_enabled'] = "1"
+        if args.profile_sample_ms is not None: engine.config['profile_sample_ms'] = str(args.profile_sample_ms)
+    stop = threading.Event()
+
+    def _stop(*_):
+        stop.set()
+        engine.process_cancel_event.set()
+        engine.monitor_cancel_event.set()
+        engine.sync_cancel_event.set()
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    try:
+        if args.headless: run_daemon(engine, stop)
+        elif args.command == "process": run_process(engine, args)
+        elif args.command == "scan": engine.run_monitor(args.collection, args.incremental)
+        elif args.command == "import-trakt": return run_import_trakt(engine, args)
+        elif args.command == "jobs": list_jobs(engine)
+        elif args.command == "resume": engine.resume_jobs()
+        elif args.command == "retry-failed": engine.retry_failed(args.collection)
+        elif args.command == "reconcile": engine.reconcile_collections({args.collection} if args.collection else None, args.dry_run)
+        elif args.command == "subscribe":
+            name = engine.subscribe_trakt(args.user, args.list_id, args.type, args.name)
+            if name: engine.sync_trakt_subscriptions(force=True, names={name})
+        elif args.command == "unsubscribe": engine.unsubscribe_trakt(args.name)
+        elif args.command == "sync-trakt": engine.sync_trakt_subscriptions(force=args.force)
+        return 0
+    finally:
+        engine.shutdown()
+
+if __name__ == "__main__":
+    sys.exit(main())
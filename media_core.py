@@ -0,0 +1,2480 @@
+# GUI-free core of Jamie's Media Command: everything here runs without tkinter/customtkinter,
+# so the desktop app (jamies_media_command.py) and the headless daemon/CLI (media_cli.py) share it.
+
+import copy
+import csv
+import contextlib
+import json
+import logging
+import math
+import os
+import queue
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from urllib.parse import quote_plus, urlencode, urlsplit, parse_qs
+from email.utils import parsedate_to_datetime
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- CONFIGURATION ---
+CONFIG_FILE = "collection_manager_config.json"
+COLLECTIONS_DATA_FILE = "collections_data.json"  # legacy v1 store, migrated into COLLECTIONS_DB_FILE
+COLLECTIONS_DB_FILE = "collections.db"
+LOOKUP_CACHE_FILE = "arr_lookup_cache.json"
+TRAKT_CACHE_FILE = "trakt_cache.json"
+
+DEFAULT_CONFIG = {"plex_url": "http://127.0.0.1:32400", "plex_token": "", "plex_movie_lib": "Movies", "plex_tv_lib": "TV Shows",
+                  "radarr_url": "http://127.0.0.1:7878", "radarr_key": "", "radarr_root": "/movies", "radarr_profile": "1",
+                  "sonarr_url": "http://127.0.0.1:8989", "sonarr_key": "", "sonarr_root": "/tv", "sonarr_profile": "1", "trakt_client_id": "",
+                  "plex_index_ttl": "300", "fuzzy_threshold": "0.8",
+                  "arr_workers": "4", "match_workers": "2", "lookup_cache_ttl_hours": "24",
+                  "full_scan_hours": "24", "auto_scan_minutes": "10", "webhook_port": "", "webhook_token": "",
+                  "webhook_fallback_minutes": "60", "recheck_base_minutes": "10", "recheck_max_hours": "24",
+                  "scan_budget": "500", "plex_workers": "4", "trakt_sync_minutes": "360", "trakt_max_pages": "20",
+                  "log_level": "debug", "log_file": "", "log_file_mb": "5", "metrics_file": "",
+                  "profile_enabled": "0", "profile_sample_ms": "0", "profile_dir": "profiles"}
+
+def load_config(path=CONFIG_FILE):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f: return {**DEFAULT_CONFIG, **json.load(f)}
+        except Exception as e: print(f"Config Error: {e}")
+    return dict(DEFAULT_CONFIG)
+
+def save_config(config, path=CONFIG_FILE):
+    with open(path, 'w') as f: json.dump(config, f, indent=4)
+
+def config_num(config, key, default, cast=int):
+    try: return cast(config.get(key, default))
+    except (ValueError, TypeError): return default
+
+# --- LOGGING ---
+# Engine and UI messages go through one LogSink: a bounded, thread-safe ring buffer that UIs drain on a timer,
+# plus an optional rotating file. Per-item chatter ("-> Found", fuzzy matches, downloader results) is "debug".
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LOG_BUFFER_LINES = 5000
+LOG_FILE_BACKUPS = 3
+
+def message_level(msg):
+    return "error" if msg.startswith("[ERROR]") or "Error" in msg else "info"
+
+class LogSink:
+    def __init__(self, capacity=LOG_BUFFER_LINES, echo=False):
+        self.lines = deque(maxlen=capacity)
+        self.seq = 0  # number of lines ever written; a reader's cursor is the last seq it saw
+        self.lock = threading.Lock()
+        self.echo = echo
+        self.level = LOG_LEVELS["info"]
+        self.file_logger, self.file_signature = None, None
+
+    def configure(self, config):
+        self.level = LOG_LEVELS.get(str(config.get("log_level", "debug")).lower(), LOG_LEVELS["debug"])
+        signature = (config.get("log_file") or "", config_num(config, "log_file_mb", 5, float))
+        if signature == self.file_signature: return
+        self.close()
+        self.file_signature = signature
+        if not signature[0]: return
+        try:
+            handler = RotatingFileHandler(signature[0], maxBytes=int(signature[1] * 1024 * 1024), backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            self.file_logger = logging.getLogger(f"jamies_media_command.{id(self)}")
+            self.file_logger.propagate = False
+            self.file_logger.setLevel(logging.DEBUG)
+            self.file_logger.addHandler(handler)
+        except OSError as e: self.write(f"Log File Error: {e}", "error")
+
+    def close(self):
+        if self.file_logger:
+            for h in list(self.file_logger.handlers): self.file_logger.removeHandler(h); h.close()
+        self.file_logger = None
+
+    def write(self, msg, level=None):
+        level = level or message_level(msg)
+        if LOG_LEVELS.get(level, 20) < self.level: return False
+        line = time.strftime("[%H:%M:%S] ") + msg
+        with self.lock:
+            self.seq += 1
+            self.lines.append(line)
+        if self.echo: print(line, flush=True)
+        if self.file_logger: self.file_logger.log(LOG_LEVELS.get(level, 20), msg)
+        return True
+
+    def since(self, cursor, limit=None):
+        # -> (new cursor, lines written after cursor, lines lost because the reader fell behind the ring)
+        with self.lock:
+            new = min(self.seq - cursor, len(self.lines))
+            lines = list(self.lines)[len(self.lines) - new:] if new else []
+            dropped, cursor = self.seq - cursor - new, self.seq
+        if limit is not None and len(lines) > limit: dropped, lines = dropped + len(lines) - limit, lines[-limit:]
+        return cursor, lines, dropped
+
+# --- METRICS ---
+# Counters, gauges and latency histograms for the hot paths. Shown in the Monitor tab's stats panel, served as
+# Prometheus text at GET /metrics on the webhook port, and written to metrics_file (if set) after each scan/run.
+METRIC_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_HELP = {
+    "jmc_plex_lookup_seconds": "Plex index lookup latency by the pass that answered (rating_key, guid, exact, title, fuzzy, miss).",
+    "jmc_plex_tag_seconds": "Plex collection edit latency (batch multi-edit or single-item fallback).",
+    "jmc_plex_tagged_items_total": "Items tagged into or untagged from Plex collections.",
+    "jmc_http_request_seconds": "HTTP request latency per service and endpoint.",
+    "jmc_http_responses_total": "HTTP responses per service, endpoint and status code ('error' = no response).",
+    "jmc_monitor_scans_total": "Monitor scan passes.",
+    "jmc_monitor_scan_seconds": "Monitor scan pass duration.",
+    "jmc_monitor_items_checked_total": "Pending items checked by monitor scans.",
+    "jmc_monitor_items_found_total": "Pending items found in Plex by monitor scans.",
+    "jmc_monitor_last_scan_items": "Items checked by the most recent scan.",
+    "jmc_monitor_last_scan_timestamp_seconds": "Unix time the most recent scan finished.",
+    "jmc_process_items_total": "Processed list items by outcome.",
+    "jmc_process_run_seconds": "Process run duration.",
+    "jmc_webhook_events_total": "Webhook events received per source.",
+    "jmc_data_lock_wait_seconds": "Time spent waiting for the collection data lock.",
+    "jmc_data_lock_hold_seconds": "Time the collection data lock was held.",
+}
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters, self.gauges, self.histograms = {}, {}, {}
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, n=1, **labels):
+        k = self.key(name, labels)
+        with self.lock: self.counters[k] = self.counters.get(k, 0) + n
+
+    def set(self, name, value, **labels):
+        with self.lock: self.gauges[self.key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        k = self.key(name, labels)
+        with self.lock:
+            h = self.histograms.get(k)
+            if h is None: h = self.histograms[k] = {"buckets": [0] * (len(METRIC_BUCKETS) + 1), "count": 0, "sum": 0.0, "max": 0.0}
+            h["buckets"][bisect_left(METRIC_BUCKETS, seconds)] += 1
+            h["count"] += 1
+            h["sum"] += seconds
+            h["max"] = max(h["max"], seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try: yield
+        finally: self.observe(name, time.perf_counter() - start, **labels)
+
+    def copy(self):
+        with self.lock:
+            return dict(self.counters), dict(self.gauges), {k: {**h, "buckets": list(h["buckets"])} for k, h in self.histograms.items()}
+
+    @staticmethod
+    def quantile(h, q):
+        # Upper bound of the bucket holding the q-th observation (the max for the overflow bucket)
+        target, seen = q * h["count"], 0
+        for bound, n in zip(METRIC_BUCKETS + (h["max"],), h["buckets"]):
+            seen += n
+            if seen >= target: return min(bound, h["max"])
+        return h["max"]
+
+    def prometheus(self):
+        counters, gauges, hists = self.copy()
+
+        def series(name, labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs: return name
+            esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return name + "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        for kind, table in (("counter", counters), ("gauge", gauges), ("histogram", hists)):
+            for name in sorted({n for n, _ in table}):
+                if name in METRIC_HELP: lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (n, labels), v in sorted(table.items()):
+                    if n != name: continue
+                    if kind != "histogram":
+                        lines.append(f"{series(name, labels)} {v}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(METRIC_BUCKETS, v["buckets"]):
+                        cumulative += count
+                        lines.append(f"{series(name + '_bucket', labels, [('le', repr(bound))])} {cumulative}")
+                    lines.append(f"{series(name + '_bucket', labels, [('le', '+Inf')])} {v['count']}")
+                    lines.append(f"{series(name + '_sum', labels)} {v['sum']:.6f}")
+                    lines.append(f"{series(name + '_count', labels)} {v['count']}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self):
+        # Compact digest for the stats panel; histogram percentiles are bucket upper bounds
+        counters, gauges, hists = self.copy()
+
+        def label(name, labels):
+            name = name[4:] if name.startswith("jmc_") else name
+            return name + (" " + " ".join(f"{k}={v}" for k, v in labels) if labels else "")
+
+        lines = [f"{label(n, l)}: n={h['count']} avg={h['sum'] / h['count'] * 1000:.2f}ms p50<={self.quantile(h, 0.5) * 1000:.2f}ms "
+                 f"p99<={self.quantile(h, 0.99) * 1000:.2f}ms max={h['max'] * 1000:.2f}ms" for (n, l), h in sorted(hists.items()) if h['count']]
+        lines += [f"{label(n, l)}: {v:g}" for (n, l), v in sorted(counters.items())]
+        lines += [f"{label(n, l)}: {v:g}" for (n, l), v in sorted(gauges.items()) if not n.endswith("timestamp_seconds")]
+        return lines
+
+    def write(self, path):
+        # Atomic so a node_exporter textfile collector never reads half a file
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f: f.write(self.prometheus())
+        os.replace(tmp, path)
+
+class TimedLock:
+    # threading.Lock that records how long callers waited for it and how long they held it
+    def __init__(self, metrics, name):
+        self.lock = threading.Lock()
+        self.metrics = metrics
+        self.name = name
+        self.acquired_at = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        ok = self.lock.acquire(blocking, timeout)
+        if ok:
+            self.acquired_at = time.perf_counter()
+            self.metrics.observe(f"{self.name}_wait_seconds", self.acquired_at - start)
+        return ok
+
+    def release(self):
+        held = time.perf_counter() - self.acquired_at
+        self.lock.release()
+        self.metrics.observe(f"{self.name}_hold_seconds", held)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+# --- PROFILING ---
+# Per-run timed spans (thread-tagged) exported as Chrome trace JSON for chrome://tracing or ui.perfetto.dev.
+# While no run is being profiled, span() hands back a shared no-op context and complete() returns at once.
+NO_SPAN = contextlib.nullcontext()
+PROFILE_TOP_FUNCTIONS = 30
+
+class Profiler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = False
+        self.depth = 0
+        self.label = ""
+        self.origin = 0.0
+        self.events, self.threads = [], {}
+        self.sampler, self.sample_stop = None, threading.Event()
+        self.samples = 0
+        self.self_counts, self.cum_counts, self.thread_samples = {}, {}, {}
+
+    def begin(self, label, sample_ms=0):
+        # Nested runs (e.g. a scan during a process run) record into the outer run's trace
+        with self.lock:
+            self.depth += 1
+            if self.depth > 1: return
+            self.label, self.origin = label, time.perf_counter()
+            self.events, self.threads = [], {}
+            self.samples, self.self_counts, self.cum_counts, self.thread_samples = 0, {}, {}, {}
+            self.active = True
+        if sample_ms > 0:
+            self.sample_stop.clear()
+            self.sampler = threading.Thread(target=self.sample_loop, args=(sample_ms / 1000.0,), name="profiler-sampler", daemon=True)
+            self.sampler.start()
+
+    def end(self):
+        # Returns the finished run's (label, events, summary lines) once the outermost run ends, else None
+        with self.lock:
+            self.depth = max(0, self.depth - 1)
+            if self.depth: return None
+            self.active = False
+        if self.sampler:
+            self.sample_stop.set()
+            self.sampler.join()
+            self.sampler = None
+        with self.lock: return self.label, self.trace_events(), self.summary_lines()
+
+    def complete(self, name, cat, start, **args):
+        # Records a span that started at perf_counter() value `start` and ends now
+        if not self.active: return
+        end, thread = time.perf_counter(), threading.current_thread()
+        event = {"name": name, "cat": cat, "ph": "X", "ts": round((start - self.origin) * 1e6, 1),
+                 "dur": round((end - start) * 1e6, 1), "pid": os.getpid(), "tid": thread.ident}
+        if args: event["args"] = args
+        with self.lock:
+            if not self.active: return
+            self.events.append(event)
+            self.threads.setdefault(thread.ident, thread.name)
+
+    def span(self, name, cat="engine", **args):
+        return self.timed(name, cat, args) if self.active else NO_SPAN
+
+    @contextlib.contextmanager
+    def timed(self, name, cat, args):
+        start = time.perf_counter()
+        try: yield
+        finally: self.complete(name, cat, start, **args)
+
+    def trace_events(self):
+        meta = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0, "args": {"name": f"Jamie's Media Command: {self.label}"}}]
+        meta += [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}} for tid, name in self.threads.items()]
+        return meta + sorted(self.events, key=lambda e: e["ts"])
+
+    # Sampled profile: cProfile only sees the thread that enabled it, so the worker pools are covered by
+    # periodically sampling every thread's stack instead and counting self/cumulative hits per function.
+    def sample_loop(self, interval):
+        me = threading.get_ident()
+        while not self.sample_stop.wait(interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            counted = []
+            for tid, frame in sys._current_frames().items():
+                if tid == me: continue
+                stack, top = set(), None
+                while frame is not None:
+                    code = frame.f_code
+                    fn = (code.co_filename, code.co_firstlineno, code.co_name)
+                    if top is None: top = fn
+                    stack.add(fn)
+                    frame = frame.f_back
+                counted.append((names.get(tid, str(tid)), top, stack))
+            with self.lock:
+                for thread, top, stack in counted:
+                    self.samples += 1
+                    self.thread_samples[thread] = self.thread_samples.get(thread, 0) + 1
+                    self.self_counts[top] = self.self_counts.get(top, 0) + 1
+                    for fn in stack: self.cum_counts[fn] = self.cum_counts.get(fn, 0) + 1
+
+    def summary_lines(self):
+        if not self.samples: return []
+        lines = [f"{self.samples} thread samples; " + ", ".join(f"{t} {n}" for t, n in sorted(self.thread_samples.items(), key=lambda kv: -kv[1])), "",
+                 f"{'self%':>6} {'cum%':>6}  function"]
+        top = sorted(self.self_counts.items(), key=lambda kv: (-kv[1], -self.cum_counts[kv[0]]))[:PROFILE_TOP_FUNCTIONS]
+        for fn, n in top:
+            path, line, name = fn
+            lines.append(f"{n * 100 / self.samples:6.1f} {self.cum_counts[fn] * 100 / self.samples:6.1f}  {name} ({os.path.basename(path)}:{line})")
+        return lines
+
+ROMAN_RE = re.compile(r"^(?=[ivx]+$)(x{0,3})(ix|iv|v?i{0,3})$")
+ROMAN_VALUES = {"i": 1, "v": 5, "x": 10}
+
+def roman_to_int(token):
+    total = 0
+    for i, ch in enumerate(token):
+        v = ROMAN_VALUES[ch]
+        total += -v if i + 1 < len(token) and ROMAN_VALUES[token[i + 1]] > v else v
+    return total
+
+def normalize_title(title):
+    t = unicodedata.normalize("NFKD", str(title or "")).encode("ascii", "ignore").decode().lower()
+    t = re.sub(r",\s*(the|a|an)\s*$", "", t.replace("&", " and "))
+    words = re.sub(r"[^a-z0-9]+", " ", t).split()
+    if len(words) > 1 and words[0] in ("the", "a", "an"): words = words[1:]
+    return " ".join(str(roman_to_int(w)) if ROMAN_RE.match(w) else w for w in words)
+
+# --- EXTERNAL IDS ---
+# Items carry {"tmdb": int, "imdb": str, "tvdb": int} when a source (Trakt, Plex) provides them.
+EXTERNAL_ID_KEYS = ("tmdb", "imdb", "tvdb")
+
+def clean_ids(ids):
+    out = {}
+    for k in EXTERNAL_ID_KEYS:
+        v = (ids or {}).get(k)
+        if v in (None, ""): continue
+        try: out[k] = str(v) if k == "imdb" else int(v)
+        except (ValueError, TypeError): pass
+    return out
+
+def plex_guid_ids(m):
+    ids = {}
+    for g in getattr(m, 'guids', None) or []:
+        scheme, _, value = str(getattr(g, 'id', '')).partition("://")
+        if scheme in EXTERNAL_ID_KEYS and value: ids[scheme] = value
+    return clean_ids(ids)
+
+def remember_match(item, m):
+    item['found'] = True
+    item['rating_key'] = str(m.ratingKey)
+    ids = {**plex_guid_ids(m), **item.get('ids', {})}
+    if ids: item['ids'] = ids
+    item['last_seen_state'] = "found"
+
+# --- PROCESS JOBS ---
+JOB_OPEN_STAGES = ("queued", "matched", "missing")
+JOB_FINAL_STAGES = ("tagged", "submitted", "waiting", "unavailable", "failed")
+ARR_JOB_STAGES = {"added": "submitted", "skipped": "submitted", "missed": "unavailable", "error": "failed"}
+
+# --- RECHECK SCHEDULE ---
+# Unfound items are rechecked with exponential backoff (base * 2^attempts, capped); a fresh downloader
+# request resets the backoff so titles that are actually on their way get checked soonest.
+ARR_STATES = {"added": "requested", "skipped": "in_downloader", "missed": "not_in_downloader", "error": "error"}
+
+def schedule_recheck(item, state, config, reset=False, now=None):
+    item['attempts'] = 0 if reset else item.get('attempts', 0) + 1
+    base = config_num(config, 'recheck_base_minutes', 10, float) * 60
+    cap = config_num(config, 'recheck_max_hours', 24, float) * 3600
+    item['next_check'] = (now or time.time()) + min(cap, base * 2 ** min(item['attempts'], 20)) * random.uniform(0.9, 1.0)
+    item['last_seen_state'] = state
+
+# --- FUZZY MATCH ENGINE ---
+# Trigram inverted index scored with the Dice coefficient. Prefix + length filtering means a query
+# only touches candidates that can still clear the threshold, which keeps lookups flat on big libraries.
+class TitleMatcher:
+    def __init__(self, threshold=0.8, top_k=5):
+        self.threshold = threshold
+        self.top_k = top_k
+        self.grams = []
+        self.payloads = []
+        self.postings = {}  # (trigram, year) -> [doc], so a query only walks its own year's lists
+        self.year_set = set()
+
+    @staticmethod
+    def trigrams(key):
+        padded = f"  {key} "
+        return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def add(self, title, year, payload):
+        key = normalize_title(title)
+        if not key: return
+        doc = len(self.payloads)
+        grams = self.trigrams(key)
+        self.grams.append(grams)
+        self.payloads.append(payload)
+        self.year_set.add(year)
+        for g in grams: self.postings.setdefault((g, year), []).append(doc)
+
+    def query(self, title, year=None, year_tolerance=0, threshold=None, k=None):
+        t = self.threshold if threshold is None else threshold
+        q = self.trigrams(normalize_title(title))
+        if not q or not self.payloads: return []
+        n = len(q)
+        min_overlap = max(1, math.ceil(t * n / (2 - t)))
+        lo, hi = t * n / (2 - t), n * (2 - t) / t
+        years = self.year_set if year is None else range(year - year_tolerance, year + year_tolerance + 1)
+        lists = {g: [p for p in (self.postings.get((g, y)) for y in years) if p] for g in q}
+        # Prefix filter: a title sharing none of the n - min_overlap + 1 rarest grams can't reach the threshold
+        ranked = sorted(q, key=lambda g: sum(map(len, lists[g])))
+        candidates, scored = set(), {}
+        for g in ranked[:n - min_overlap + 1]:
+            for p in lists[g]: candidates.update(p)
+        for doc in candidates:
+            other = self.grams[doc]
+            if not lo <= len(other) <= hi: continue
+            score = 2 * len(q & other) / (n + len(other))
+            if score >= t:
+                p = self.payloads[doc]
+                if scored.get(id(p), (0,))[0] < score: scored[id(p)] = (score, doc, p)
+        # Ties keep library order, so the top-k doesn't depend on set iteration order
+        return [(score, p) for score, _, p in sorted(scored.values(), key=lambda x: (-x[0], x[1]))[:k or self.top_k]]
+
+# --- HTTP LAYER ---
+# Per-service pooled sessions with a token-bucket limiter, jittered retries for idempotent calls,
+# Retry-After handling on 429 and per-host latency/error counters.
+HTTP_SERVICES = {
+    "plex": {"pool": 10},
+    "radarr": {"pool": 10},
+    "sonarr": {"pool": 10},
+    "trakt": {"pool": 4, "rate": 3.3, "burst": 10},  # Trakt allows 1000 GETs / 5 min
+}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+RETRY_STATUSES = {500, 502, 503, 504}
+ENDPOINT_ID_RE = re.compile(r"/\d+(?=/|$)")
+
+class JitteredRetry(Retry):
+    # urllib3 retries for sessions driven by other libraries (plexapi), on the same full-jitter curve as ServiceClient.delay
+    def get_backoff_time(self):
+        attempt = len(self.history)
+        return random.uniform(0, min(30.0, self.backoff_factor * (2 ** (attempt - 1)))) if attempt else 0
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def retry_after_seconds(value, default):
+    if not value: return default
+    try: return max(0.0, float(value))
+    except ValueError: pass
+    try: return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError): return default
+
+class ServiceClient:
+    def __init__(self, name, pool=10, rate=None, burst=None, retries=3, backoff=0.5, timeout=15, metrics=None, profiler=None):
+        self.name = name
+        self.metrics = metrics
+        self.profiler = profiler
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool = pool
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool, pool_maxsize=pool)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.library_mode = False
+        self.limiter = TokenBucket(rate, burst or rate) if rate else None
+        self.blocked_until = 0
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    def record(self, host, elapsed, error):
+        with self.stats_lock:
+            st = self.stats.setdefault(host, {"requests": 0, "errors": 0, "retries": 0, "latency_total": 0.0, "latency_max": 0.0})
+            st["requests"] += 1
+            st["errors"] += int(error)
+            st["latency_total"] += elapsed
+            st["latency_max"] = max(st["latency_max"], elapsed)
+
+    def count_retry(self, host, n=1):
+        with self.stats_lock: self.stats[host]["retries"] += n
+
+    def delay(self, attempt):
+        return random.uniform(0, min(30.0, self.backoff * (2 ** attempt)))
+
+    def observe(self, endpoint, start, code, attempt):
+        if self.profiler: self.profiler.complete(f"{self.name} {endpoint}", "http", start, code=code, attempt=attempt)
+        if not self.metrics: return
+        self.metrics.observe("jmc_http_request_seconds", time.perf_counter() - start, service=self.name, endpoint=endpoint)
+        self.metrics.inc("jmc_http_responses_total", service=self.name, endpoint=endpoint, code=code)
+
+    def request(self, method, url, endpoint=None, **kwargs):
+        # endpoint labels the call in metrics (e.g. "lookup", "add"); defaults to the HTTP method
+        endpoint = endpoint or method.lower()
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            wait = self.blocked_until - time.monotonic()
+            if wait > 0: time.sleep(wait)
+            if self.limiter: self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                self.record(host, time.perf_counter() - start, True)
+                self.observe(endpoint, start, "error", attempt)
+                if last or not idempotent: raise
+                self.count_retry(host)
+                time.sleep(self.delay(attempt))
+                continue
+            self.record(host, time.perf_counter() - start, resp.status_code >= 500 or resp.status_code == 429)
+            self.observe(endpoint, start, str(resp.status_code), attempt)
+            if last: return resp
+            if resp.status_code == 429:
+                self.blocked_until = time.monotonic() + retry_after_seconds(resp.headers.get("Retry-After"), self.delay(attempt))
+            elif not (idempotent and resp.status_code in RETRY_STATUSES):
+                return resp
+            else:
+                time.sleep(self.delay(attempt))
+            self.count_retry(host)
+        return resp
+
+    def get(self, url, **kwargs): return self.request("GET", url, **kwargs)
+    def post(self, url, **kwargs): return self.request("POST", url, **kwargs)
+
+    def library_session(self):
+        # For a library that sends through self.session itself (plexapi) instead of request(): idempotent calls
+        # get urllib3 retries on connection errors and 5xx, and a response hook feeds the same per-host counters
+        # and metrics. Endpoints are labelled by method and path with numeric ids folded to ":id".
+        if not self.library_mode:
+            self.library_mode = True
+            retry = JitteredRetry(total=self.retries, connect=self.retries, read=self.retries, status=self.retries,
+                                  backoff_factor=self.backoff, status_forcelist=RETRY_STATUSES, allowed_methods=frozenset(IDEMPOTENT_METHODS),
+                                  respect_retry_after_header=True, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=self.pool, pool_maxsize=self.pool, max_retries=retry)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            self.session.hooks["response"].append(self.on_response)
+        return self.session
+
+    def on_response(self, resp, *args, **kwargs):
+        parts = urlsplit(resp.url)
+        elapsed = resp.elapsed.total_seconds()
+        self.record(parts.netloc, elapsed, resp.status_code >= 500 or resp.status_code == 429)
+        retries = getattr(getattr(resp.raw, "retries", None), "history", None)
+        if retries: self.count_retry(parts.netloc, len(retries))
+        endpoint = f"{resp.request.method.lower()} {ENDPOINT_ID_RE.sub('/:id', parts.path) or '/'}"
+        self.observe(endpoint, time.perf_counter() - elapsed, str(resp.status_code), len(retries or ()))
+
+class HttpClient:
+    def __init__(self, services=HTTP_SERVICES, metrics=None, profiler=None):
+        self.presets = services
+        self.metrics = metrics
+        self.profiler = profiler
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def service(self, name):
+        with self.lock:
+            if name not in self.clients: self.clients[name] = ServiceClient(name, metrics=self.metrics, profiler=self.profiler, **self.presets.get(name, {}))
+            return self.clients[name]
+
+    def stats(self):
+        with self.lock: clients = list(self.clients.values())
+        out = {}
+        for c in clients:
+            with c.stats_lock:
+                for host, st in c.stats.items(): out[f"{c.name}@{host}"] = dict(st)
+        return out
+
+    def summary_lines(self):
+        return [f"[HTTP] {key}: {st['requests']} req, {st['errors']} err, {st['retries']} retries, "
+                f"avg {st['latency_total'] / st['requests'] * 1000:.0f} ms, max {st['latency_max'] * 1000:.0f} ms"
+                for key, st in sorted(self.stats().items()) if st['requests']]
+
+# --- COLLECTION STORE ---
+# SQLite-backed collections: per-item updates in atomic transactions, summaries without loading items.
+# Items are plain dicts ({"id", "title", "year", "found", "ids"?, "rating_key"?, "next_check", "attempts",
+# "last_seen_state"?}); pass them back to update_items() after changing them.
+# v2: JSON file imported into SQLite. v3: per-item recheck schedule + normalized title key. v4: process jobs.
+# v5: Trakt list subscriptions. v6: per-collection found/total counters kept current by triggers.
+STORE_SCHEMA_VERSION = 6
+ITEM_COLUMNS = ("title", "year", "found", "rating_key", "ids", "next_check", "attempts", "last_seen_state", "title_key")
+ITEM_SELECT = "i.id, i.title, i.year, i.found, i.rating_key, i.ids, i.next_check, i.attempts, i.last_seen_state"
+
+class CollectionStore:
+    INSERT_ITEM = f"INSERT INTO items (collection, {', '.join(ITEM_COLUMNS)}) VALUES ({', '.join('?' * (len(ITEM_COLUMNS) + 1))})"
+    UPDATE_ITEM = f"UPDATE items SET {', '.join(c + ' = ?' for c in ITEM_COLUMNS)} WHERE id = ?"
+
+    def __init__(self, path, profiler=None):
+        self.path = path
+        self.profiler = profiler or Profiler()
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS collections (name TEXT PRIMARY KEY, type TEXT NOT NULL, created REAL);
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY,
+                    collection TEXT NOT NULL REFERENCES collections(name) ON DELETE CASCADE,
+                    title TEXT NOT NULL, year INTEGER, found INTEGER NOT NULL DEFAULT 0,
+                    rating_key TEXT, ids TEXT);
+                CREATE INDEX IF NOT EXISTS idx_items_collection_found ON items(collection, found);
+                CREATE INDEX IF NOT EXISTS idx_items_found ON items(found);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+        self.version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        self.upgrade_schema()
+
+    def upgrade_schema(self):
+        # Columns added after v2; a fresh file gets them here too, then migrate_json stamps the version
+        cols = {r[1] for r in self.conn.execute("PRAGMA table_info(items)")}
+        with self.lock, self.conn:
+            for col, decl in (("next_check", "REAL NOT NULL DEFAULT 0"), ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+                              ("last_seen_state", "TEXT"), ("title_key", "TEXT")):
+                if col not in cols: self.conn.execute(f"ALTER TABLE items ADD COLUMN {col} {decl}")
+            if "title_key" not in cols:
+                rows = self.conn.execute("SELECT id, title FROM items").fetchall()
+                self.conn.executemany("UPDATE items SET title_key = ? WHERE id = ?", [(normalize_title(t), i) for i, t in rows])
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_items_due ON items(found, next_check)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_items_title_key ON items(found, title_key)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_items_collection_title_key ON items(collection, title_key)")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    collection TEXT NOT NULL REFERENCES collections(name) ON DELETE CASCADE,
+                    type TEXT NOT NULL, status TEXT NOT NULL, created REAL, updated REAL);
+                CREATE TABLE IF NOT EXISTS job_items (
+                    job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+                    item_id INTEGER NOT NULL REFERENCES items(id) ON DELETE CASCADE,
+                    stage TEXT NOT NULL, error TEXT, updated REAL, PRIMARY KEY (job_id, item_id));
+                CREATE INDEX IF NOT EXISTS idx_job_items_stage ON job_items(job_id, stage);
+                CREATE TABLE IF NOT EXISTS subscriptions (
+                    collection TEXT PRIMARY KEY REFERENCES collections(name) ON DELETE CASCADE,
+                    user TEXT NOT NULL, list_id TEXT NOT NULL, type TEXT NOT NULL,
+                    updated_at TEXT, keys TEXT, synced REAL);
+            """)
+            # Counters follow every insert/delete/found flip, so summaries never have to scan items
+            ccols = {r[1] for r in self.conn.execute("PRAGMA table_info(collections)")}
+            if "item_count" not in ccols:
+                self.conn.execute("ALTER TABLE collections ADD COLUMN found_count INTEGER NOT NULL DEFAULT 0")
+                self.conn.execute("ALTER TABLE collections ADD COLUMN item_count INTEGER NOT NULL DEFAULT 0")
+                self.conn.execute("""UPDATE collections SET
+                                     found_count = (SELECT COALESCE(SUM(found), 0) FROM items WHERE collection = collections.name),
+                                     item_count = (SELECT COUNT(*) FROM items WHERE collection = collections.name)""")
+            self.conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS items_count_insert AFTER INSERT ON items BEGIN
+                    UPDATE collections SET item_count = item_count + 1, found_count = found_count + NEW.found WHERE name = NEW.collection; END;
+                CREATE TRIGGER IF NOT EXISTS items_count_delete AFTER DELETE ON items BEGIN
+                    UPDATE collections SET item_count = item_count - 1, found_count = found_count - OLD.found WHERE name = OLD.collection; END;
+                CREATE TRIGGER IF NOT EXISTS items_count_found AFTER UPDATE OF found ON items WHEN NEW.found != OLD.found BEGIN
+                    UPDATE collections SET found_count = found_count + NEW.found - OLD.found WHERE name = NEW.collection; END;
+            """)
+            if self.version >= 2 and self.version < STORE_SCHEMA_VERSION:
+                self.conn.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION}")
+                self.version = STORE_SCHEMA_VERSION
+
+    @staticmethod
+    def row_to_item(row):
+        item = {"id": row[0], "title": row[1], "year": row[2], "found": bool(row[3])}
+        if row[4]: item['rating_key'] = row[4]
+        if row[5]: item['ids'] = json.loads(row[5])
+        item['next_check'], item['attempts'] = row[6], row[7]
+        if row[8]: item['last_seen_state'] = row[8]
+        return item
+
+    @staticmethod
+    def item_row(item):
+        return (item['title'], item['year'], int(bool(item['found'])), item.get('rating_key'), json.dumps(item['ids']) if item.get('ids') else None,
+                item.get('next_check', 0), item.get('attempts', 0), item.get('last_seen_state'), normalize_title(item['title']))
+
+    # --- migration ---
+    def migrate_json(self, json_path):
+        if self.version >= 2: return 0
+        count = 0
+        if os.path.exists(json_path):
+            with open(json_path, 'r') as f: data = json.load(f)
+            with self.lock, self.conn:
+                for name, col in data.items():
+                    if name.startswith('_'):
+                        if name != "_schema": self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name.lstrip('_'), json.dumps(col)))
+                        continue
+                    self.conn.execute("INSERT OR IGNORE INTO collections (name, type, created) VALUES (?, ?, ?)", (name, col.get('type', 'movie'), time.time()))
+                    self.conn.executemany(self.INSERT_ITEM, [(name,) + self.item_row(i) for i in col.get('items', [])])
+                    count += 1
+                self.conn.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION}")
+            os.replace(json_path, json_path + ".migrated")
+        else:
+            with self.lock, self.conn: self.conn.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION}")
+        self.version = STORE_SCHEMA_VERSION
+        return count
+
+    # --- collections ---
+    def summaries(self):
+        with self.lock:
+            return self.conn.execute("SELECT name, type, found_count, item_count FROM collections ORDER BY created, name").fetchall()
+
+    def collection_counts(self, name):
+        # -> (found, total) or None if the collection is gone
+        with self.lock:
+            return self.conn.execute("SELECT found_count, item_count FROM collections WHERE name = ?", (name,)).fetchone()
+
+    def collection_type(self, name):
+        with self.lock:
+            row = self.conn.execute("SELECT type FROM collections WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def create_collection(self, name, m_type):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO collections (name, type, created) VALUES (?, ?, ?)", (name, m_type, time.time()))
+
+    def delete_collection(self, name):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM collections WHERE name = ?", (name,))
+
+    # --- items ---
+    def items(self, name, pending_only=False, limit=None, offset=0):
+        sql = f"SELECT {ITEM_SELECT} FROM items i WHERE i.collection = ?" + (" AND i.found = 0" if pending_only else "") + " ORDER BY i.id"
+        if limit is not None: sql += f" LIMIT {int(limit)} OFFSET {int(offset)}"
+        with self.lock:
+            return [self.row_to_item(r) for r in self.conn.execute(sql, (name,))]
+
+    def pending_query(self, where="", args=(), order="i.id", limit=None):
+        sql = f"""SELECT {ITEM_SELECT}, c.name, c.type FROM items i
+                  JOIN collections c ON c.name = i.collection WHERE i.found = 0{where} ORDER BY {order}"""
+        if limit is not None: sql += f" LIMIT {int(limit)}"
+        with self.lock:
+            return [(r[9], r[10], self.row_to_item(r)) for r in self.conn.execute(sql, list(args))]
+
+    def pending_items(self, name=None, m_type=None):
+        where, args = "", []
+        if name is not None: where += " AND c.name = ?"; args.append(name)
+        if m_type is not None: where += " AND c.type = ?"; args.append(m_type)
+        return self.pending_query(where, args)
+
+    def due_items(self, now, limit):
+        # Fewest attempts first, so fresh submissions win the per-scan budget over long-missing titles
+        return self.pending_query(" AND i.next_check <= ?", (now,), order="i.attempts, i.next_check", limit=limit)
+
+    def pending_by_title_keys(self, m_type, keys):
+        keys, out = list(keys), []
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            out += self.pending_query(f" AND c.type = ? AND i.title_key IN ({', '.join('?' * len(chunk))})", [m_type] + chunk)
+        return out
+
+    def items_by_title_keys(self, name, keys):
+        # One collection's items whose normalized title is in keys (duplicate checks for streamed imports)
+        keys, out = list(keys), []
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                out += [self.row_to_item(r) for r in self.conn.execute(
+                    f"SELECT {ITEM_SELECT} FROM items i WHERE i.collection = ? AND i.title_key IN ({', '.join('?' * len(chunk))})", [name] + chunk)]
+        return out
+
+    def pending_types(self):
+        with self.lock:
+            return {r[0] for r in self.conn.execute("SELECT DISTINCT c.type FROM items i JOIN collections c ON c.name = i.collection WHERE i.found = 0")}
+
+    def add_items(self, name, items):
+        with self.profiler.span("store.add_items", "store", items=len(items)), self.lock, self.conn:
+            for item in items:
+                item['id'] = self.conn.execute(self.INSERT_ITEM, (name,) + self.item_row(item)).lastrowid
+
+    def remove_items(self, items):
+        with self.profiler.span("store.remove_items", "store", items=len(items)), self.lock, self.conn:
+            self.conn.executemany("DELETE FROM items WHERE id = ?", [(i['id'],) for i in items])
+
+    def update_items(self, items):
+        if not items: return
+        with self.profiler.span("store.update_items", "store", items=len(items)), self.lock, self.conn:
+            self.conn.executemany(self.UPDATE_ITEM, [self.item_row(i) + (i['id'],) for i in items])
+
+    # --- jobs ---
+    # A job is one run_process call; each of its items moves queued -> matched/missing -> a final stage
+    # (see JOB_FINAL_STAGES). Open jobs with unfinished items are resumed on the next start.
+    def create_job(self, name, m_type):
+        now = time.time()
+        with self.lock, self.conn:
+            return self.conn.execute("INSERT INTO jobs (collection, type, status, created, updated) VALUES (?, ?, 'open', ?, ?)",
+                                     (name, m_type, now, now)).lastrowid
+
+    def add_job_items(self, job_id, items, stage="queued"):
+        now = time.time()
+        with self.profiler.span("store.add_job_items", "store", items=len(items)), self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO job_items VALUES (?, ?, ?, NULL, ?)", [(job_id, i['id'], stage, now) for i in items])
+
+    def set_job_stages(self, job_id, updates):
+        # updates: [(item, stage, error)]
+        if not updates: return
+        now = time.time()
+        with self.profiler.span("store.set_job_stages", "store", items=len(updates)), self.lock, self.conn:
+            self.conn.executemany("UPDATE job_items SET stage = ?, error = ?, updated = ? WHERE job_id = ? AND item_id = ?",
+                                  [(stage, error, now, job_id, i['id']) for i, stage, error in updates])
+            self.conn.execute("UPDATE jobs SET updated = ? WHERE id = ?", (now, job_id))
+
+    def job_items(self, job_id, stages, page=500, after=0):
+        # Yields (item, stage) with item id > after, paged by id, so a large job is never held in memory at once
+        sql = f"""SELECT {ITEM_SELECT}, j.stage FROM job_items j JOIN items i ON i.id = j.item_id
+                  WHERE j.job_id = ? AND j.stage IN ({', '.join('?' * len(stages))}) AND i.id > ? ORDER BY i.id LIMIT ?"""
+        last = after
+        while True:
+            with self.lock: rows = self.conn.execute(sql, [job_id] + list(stages) + [last, page]).fetchall()
+            for r in rows: yield self.row_to_item(r), r[9]
+            if len(rows) < page: return
+            last = rows[-1][0]
+
+    def jobs(self, status=None, name=None):
+        # -> [(id, collection, type, status, created, {stage: count})]
+        where, args = [], []
+        if status is not None: where.append("status = ?"); args.append(status)
+        if name is not None: where.append("collection = ?"); args.append(name)
+        with self.lock:
+            rows = self.conn.execute("SELECT id, collection, type, status, created FROM jobs" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id", args).fetchall()
+            counts = {}
+            for job_id, stage, n in self.conn.execute("SELECT job_id, stage, COUNT(*) FROM job_items GROUP BY job_id, stage"):
+                counts.setdefault(job_id, {})[stage] = n
+        return [r + (counts.get(r[0], {}),) for r in rows]
+
+    def job_stage_counts(self, job_id):
+        with self.lock:
+            return dict(self.conn.execute("SELECT stage, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY stage", (job_id,)).fetchall())
+
+    def set_job_status(self, job_id, status):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def requeue_failed(self, name=None):
+        # Failed items go back to 'queued' and their jobs reopen; returns the affected job ids
+        sql = "SELECT DISTINCT j.job_id FROM job_items j JOIN jobs b ON b.id = j.job_id WHERE j.stage = 'failed'"
+        with self.lock, self.conn:
+            ids = [r[0] for r in self.conn.execute(sql + (" AND b.collection = ?" if name else ""), (name,) if name else ())]
+            for job_id in ids:
+                self.conn.execute("UPDATE job_items SET stage = 'queued', error = NULL WHERE job_id = ? AND stage = 'failed'", (job_id,))
+                self.conn.execute("UPDATE jobs SET status = 'open', updated = ? WHERE id = ?", (time.time(), job_id))
+        return ids
+
+    # --- subscriptions ---
+    # A followed Trakt list; keys are the (normalized title, year) pairs seen at the last sync, so the next
+    # sync only processes what was added or removed.
+    def add_subscription(self, name, user, list_id, m_type):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO subscriptions VALUES (?, ?, ?, ?, NULL, '[]', 0)", (name, user, str(list_id), m_type))
+
+    def subscriptions(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT collection, user, list_id, type, updated_at, keys, synced FROM subscriptions ORDER BY collection").fetchall()
+        return [{"collection": r[0], "user": r[1], "list_id": r[2], "type": r[3], "updated_at": r[4],
+                 "keys": {tuple(k) for k in json.loads(r[5] or "[]")}, "synced": r[6]} for r in rows]
+
+    def update_subscription(self, name, updated_at, keys):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE subscriptions SET updated_at = ?, keys = ?, synced = ? WHERE collection = ?",
+                              (updated_at, json.dumps(sorted(keys, key=lambda k: (k[0], k[1] or 0))), time.time(), name))
+
+    def delete_subscription(self, name):
+        with self.lock, self.conn:
+            return self.conn.execute("DELETE FROM subscriptions WHERE collection = ?", (name,)).rowcount
+
+    # --- meta ---
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+
+def load_collections_store(path=COLLECTIONS_DB_FILE, legacy_path=COLLECTIONS_DATA_FILE):
+    store = CollectionStore(path)
+    try:
+        migrated = store.migrate_json(legacy_path)
+        if migrated: print(f"Migrated {migrated} collections from {legacy_path}")
+    except Exception as e: print(f"Data Error: {e}")
+    return store
+
+# --- RADARR / SONARR ---
+# Snapshot of what the downloader already has, so known titles are skipped before any lookup.
+ARR_LOOKUP_FIELDS = ("id", "tmdbId", "tvdbId", "imdbId", "title", "titleSlug", "year")
+
+class ArrLibraryIndex:
+    def __init__(self, records, id_key):
+        self.id_key = id_key
+        self.ids = set()
+        self.titles = set()
+        for r in records: self.add(r)
+
+    def add(self, record):
+        if record.get(self.id_key): self.ids.add(record[self.id_key])
+        self.titles.add((normalize_title(record.get("title")), record.get("year")))
+
+    def has(self, title=None, year=None, ext_id=None):
+        return (ext_id is not None and ext_id in self.ids) or (title is not None and (normalize_title(title), year) in self.titles)
+
+class LookupCache:
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f: self.entries = json.load(f)
+            except Exception as e: print(f"Lookup Cache Error: {e}")
+        now = time.time()
+        for service in self.entries.values():
+            for term in [t for t, e in service.items() if now - e.get("at", 0) > ttl]: del service[term]
+
+    def get(self, service, term):
+        with self.lock:
+            e = self.entries.get(service, {}).get(term.lower())
+            return e["data"] if e and time.time() - e["at"] <= self.ttl else None
+
+    def put(self, service, term, results):
+        data = [{k: r.get(k) for k in ARR_LOOKUP_FIELDS if k in r} for r in results]
+        with self.lock:
+            self.entries.setdefault(service, {})[term.lower()] = {"at": time.time(), "data": data}
+            self.dirty = True
+        return data
+
+    def save(self):
+        with self.lock:
+            if not self.dirty: return
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w') as f: json.dump(self.entries, f)
+            os.replace(tmp, self.path)
+            self.dirty = False
+
+# --- WEBHOOKS ---
+# Radarr/Sonarr "Download" (import) events and Plex "library.new" events, normalized to
+# {"source", "m_type", "title", "year", "ids", "rating_key"}.
+def parse_webhook(content_type, body):
+    if content_type.startswith("multipart/form-data"):
+        msg = BytesParser(policy=email_policy).parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        part = next((p for p in msg.iter_parts() if p.get_param("name", header="content-disposition") == "payload"), None)
+        if part is None: return None
+        payload = json.loads(part.get_payload(decode=True))
+    else:
+        payload = json.loads(body or b"{}")
+
+    if payload.get("event") == "library.new":
+        md = payload.get("Metadata", {})
+        if md.get("type") in ("episode", "season"):
+            return {"source": "plex", "m_type": "show", "title": md.get("grandparentTitle"), "year": None, "ids": {}, "rating_key": md.get("grandparentRatingKey")}
+        if md.get("type") not in ("movie", "show"): return None
+        ids = clean_ids(dict(str(g.get("id", "")).split("://", 1) for g in md.get("Guid", []) if "://" in str(g.get("id", ""))))
+        return {"source": "plex", "m_type": md["type"], "title": md.get("title"), "year": md.get("year"), "ids": ids, "rating_key": md.get("ratingKey")}
+
+    if payload.get("eventType") == "Download":
+        if "movie" in payload:
+            m = payload["movie"]
+            return {"source": "radarr", "m_type": "movie", "title": m.get("title"), "year": m.get("year"),
+                    "ids": clean_ids({"tmdb": m.get("tmdbId"), "imdb": m.get("imdbId")}), "rating_key": None}
+        if "series" in payload:
+            sr = payload["series"]
+            return {"source": "sonarr", "m_type": "show", "title": sr.get("title"), "year": sr.get("year"),
+                    "ids": clean_ids({"tvdb": sr.get("tvdbId"), "imdb": sr.get("imdbId")}), "rating_key": None}
+    return None
+
+WEBHOOK_RETRY_DELAYS = (15, 60, 300)  # seconds to wait for Plex to pick up a file Radarr/Sonarr just imported
+
+class WebhookServer:
+    def __init__(self, port, on_event, log, token="", metrics=None):
+        # metrics: optional callable returning Prometheus text, served at GET /metrics
+        self.port = port
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if token and parse_qs(parts.query).get("token", [""])[0] != token:
+                    self.send_response(403); self.end_headers(); return
+                if parts.path != "/metrics" or not metrics:
+                    self.send_response(404); self.end_headers(); return
+                body = metrics().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if token and parse_qs(urlsplit(self.path).query).get("token", [""])[0] != token:
+                    self.send_response(403); self.end_headers(); return
+                try:
+                    body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                    event = parse_webhook(self.headers.get("Content-Type", ""), body)
+                except Exception as e:
+                    log(f"[Webhook] Bad payload: {e}")
+                    self.send_response(400); self.end_headers(); return
+                self.send_response(202 if event else 204); self.end_headers()
+                if event: threading.Thread(target=on_event, args=(event,), daemon=True).start()
+
+        self.httpd = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# --- PLEX CLIENT ---
+# One long-lived server connection shared by every thread. Section handles are cached by name,
+# a changed URL/token forces a reconnect, and reset() drops everything so the next call reconnects.
+class PlexClientManager:
+    def __init__(self, config, session=None):
+        self.config = config
+        self.session = session or requests.Session()
+        self.lock = threading.RLock()
+        self.server = None
+        self.signature = None
+        self.sections = {}
+
+    def connect(self):
+        with self.lock:
+            sig = (self.config.get('plex_url'), self.config.get('plex_token'))
+            if self.server is None or sig != self.signature:
+                from plexapi.server import PlexServer  # deferred: plexapi is the slowest import at startup
+                self.server = PlexServer(sig[0], sig[1], session=self.session)
+                self.signature, self.sections = sig, {}
+            return self.server
+
+    def section(self, m_type):
+        name = self.config['plex_movie_lib'] if m_type == "movie" else self.config['plex_tv_lib']
+        with self.lock:
+            try:
+                if name not in self.sections: self.sections[name] = self.connect().library.section(name)
+                return self.sections[name]
+            except Exception:
+                self.reset()
+                raise
+
+    def reset(self):
+        with self.lock:
+            self.server, self.signature, self.sections = None, None, {}
+
+# Collection tags are written with one multi-edit PUT per chunk of matches instead of one PUT per item;
+# chunks keep the comma-joined id list well under Plex's URL length limit.
+TAG_BATCH_SIZE = 200
+
+# --- PLEX LIBRARY INDEX ---
+# One bulk fetch of a section, answered from memory until the TTL runs out or invalidate() is called.
+class PlexLibraryIndex:
+    def __init__(self, lib, ttl=300, fuzzy_threshold=0.8):
+        self.lib = lib
+        self.ttl = ttl
+        self.fuzzy_threshold = fuzzy_threshold
+        self.lock = threading.Lock()
+        self.built_at = 0
+        self.by_title_year = {}
+        self.by_title = {}
+        self.max_added_at = 0
+        self.by_guid = {}
+        self.by_rating_key = {}
+        self.matcher = TitleMatcher(fuzzy_threshold)
+
+    def stale(self):
+        return not self.built_at or (self.ttl > 0 and time.time() - self.built_at > self.ttl)
+
+    def invalidate(self):
+        self.built_at = 0
+
+    def ensure(self):
+        with self.lock:
+            if self.stale(): self.rebuild(self.lib.all())
+        return self
+
+    def rebuild(self, media):
+        maps = ({}, {}, {}, {}, TitleMatcher(self.fuzzy_threshold))
+        max_added_at = self.add_media(media, *maps)
+        self.by_title_year, self.by_title, self.by_guid, self.by_rating_key, self.matcher = maps
+        self.max_added_at = max_added_at
+        self.built_at = time.time()
+
+    def extend(self, media):
+        # Fold newly added items into the live maps (incremental scans); removals wait for the next rebuild
+        with self.lock:
+            added = self.add_media(media, self.by_title_year, self.by_title, self.by_guid, self.by_rating_key, self.matcher)
+            self.max_added_at = max(self.max_added_at, added)
+            self.built_at = time.time()
+
+    @staticmethod
+    def add_media(media, by_title_year, by_title, by_guid, by_rating_key, matcher):
+        max_added_at = 0
+        for m in media:
+            # Listing results are partial objects: reading an unset field (originalTitle, year, guids) would make
+            # plexapi re-fetch the whole item, one request per title
+            if hasattr(m, '_autoReload'): m._autoReload = False
+            year = getattr(m, 'year', None)
+            added = getattr(m, 'addedAt', None)
+            if added: max_added_at = max(max_added_at, added.timestamp())
+            by_rating_key[str(m.ratingKey)] = m
+            for k, v in plex_guid_ids(m).items(): by_guid[f"{k}://{v}"] = m
+            for name in {m.title, getattr(m, 'originalTitle', None)}:
+                key = normalize_title(name)
+                if not key: continue
+                by_title_year.setdefault((key, year), m)
+                by_title.setdefault(key, m)
+                matcher.add(name, year, m)
+        return max_added_at
+
+    def __len__(self):
+        return len(self.by_rating_key)
+
+    def lookup(self, title, year, ids=None, rating_key=None):
+        m = self.by_rating_key.get(str(rating_key)) if rating_key else None
+        if m: return m, "rating_key"
+        for k, v in clean_ids(ids).items():
+            m = self.by_guid.get(f"{k}://{v}")
+            if m: return m, k
+        key = normalize_title(title)
+        m = self.by_title_year.get((key, year))
+        if m: return m, "exact"
+        m = self.by_title.get(key)
+        if m: return m, "title"
+        return None, None
+
+    def fuzzy(self, title, year, k=None):
+        self.matcher.threshold = self.fuzzy_threshold
+        return self.matcher.query(title, year, k=k)
+
+# --- LIST PARSING ---
+TITLE_YEAR_RE = re.compile(r"^(.*?\S)\s*[(\[](\d{4})[)\]]$")
+
+class RowErrors:
+    # Collects malformed rows and logs them in batches instead of one line per row
+    def __init__(self, log, every=50, samples=5):
+        self.log = log
+        self.every = every
+        self.samples = samples
+        self.rows = []
+        self.total = 0
+
+    def add(self, where, text, reason):
+        self.rows.append((where, str(text)[:80], reason))
+        self.total += 1
+        if len(self.rows) >= self.every: self.flush()
+
+    def flush(self):
+        if not self.rows: return
+        shown = "; ".join(f"{w}: '{t}' ({r})" for w, t, r in self.rows[:self.samples])
+        more = f" (+{len(self.rows) - self.samples} more)" if len(self.rows) > self.samples else ""
+        self.log(f"Skipping {len(self.rows)} malformed rows: {shown}{more}")
+        self.rows = []
+
+def make_item(title, year, ids=None, import_ids=None):
+    year = str(year).strip()
+    if not year[:4].isdigit(): raise ValueError(f"bad year '{year}'" if year else "missing year")
+    item = {"title": str(title).strip(), "year": int(year[:4]), "found": False}
+    if not item['title']: raise ValueError("empty title")
+    ids = {**clean_ids(ids), **(import_ids or {}).get((normalize_title(item['title']), item['year']), {})}
+    if ids: item['ids'] = ids
+    return item
+
+def iter_list(lines, import_ids=None, log=print):
+    errors = RowErrors(log)
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and line[-1] in ")]" and ('(' in line or '[' in line):
+            m = TITLE_YEAR_RE.match(line)
+            if not m:
+                errors.add(f"line {n}", line, "expected 'Title (Year)'")
+                continue
+            yield make_item(m.group(1), m.group(2), import_ids=import_ids)
+    errors.flush()
+
+def parse_list(lines, import_ids=None, log=print):
+    return list(iter_list(lines, import_ids, log))
+
+# --- FILE IMPORT ---
+# Streaming readers for list exports. Every reader yields items one at a time from an open file, so memory
+# stays flat regardless of file size; malformed rows go to a RowErrors batch report.
+IMPORT_FORMATS = ("text", "csv", "json")
+CSV_TITLE_COLUMNS = ("title", "name", "movie", "show", "series")
+CSV_YEAR_COLUMNS = ("year", "release year", "release date", "released", "first aired")
+CSV_ID_COLUMNS = {"const": "imdb", "imdb": "imdb", "imdb id": "imdb", "imdb_id": "imdb", "imdbid": "imdb",
+                  "tmdb": "tmdb", "tmdb id": "tmdb", "tmdb_id": "tmdb", "tmdbid": "tmdb",
+                  "tvdb": "tvdb", "tvdb id": "tvdb", "tvdb_id": "tvdb", "tvdbid": "tvdb"}
+IMDB_SHOW_TYPES = {"tvseries", "tv series", "tvminiseries", "tv mini series", "tv mini-series"}
+
+def detect_import_format(path, head):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".json", ".jsonl", ".ndjson"): return "json"
+    if ext in (".csv", ".tsv"): return "csv"
+    first = head.lstrip()[:1]
+    if first in ("[", "{"): return "json"
+    header = head.splitlines()[0].lower() if head else ""
+    if "," in header and any(c in header for c in CSV_TITLE_COLUMNS): return "csv"
+    return "text"
+
+def csv_header(row):
+    cols = [c.strip().lower() for c in row]
+    title = next((i for i, c in enumerate(cols) if c in CSV_TITLE_COLUMNS), None)
+    year = next((i for i, c in enumerate(cols) if c in CSV_YEAR_COLUMNS), None)
+    return cols, title, year
+
+def iter_csv_items(f, m_type=None, import_ids=None, errors=None):
+    # Generic CSV plus Letterboxd (Name, Year, list-export preamble) and IMDb (Const, Title, Year, Title Type) exports.
+    # The header is the first of the leading rows that has both a title and a year column.
+    reader = csv.reader(f, dialect=csv.excel_tab if f.name.endswith(".tsv") else csv.excel)
+    for row in reader:
+        cols, title, year = csv_header(row)
+        if title is not None and year is not None: break
+        if reader.line_num >= 20:
+            errors.add("header", ",".join(row), "no title/year columns found")
+            return
+    else: return
+    kind_col = cols.index("title type") if "title type" in cols else None
+    id_cols = [(i, CSV_ID_COLUMNS[c]) for i, c in enumerate(cols) if c in CSV_ID_COLUMNS]
+
+    for row in reader:
+        if not any(cell.strip() for cell in row): continue
+        where = f"line {reader.line_num}"
+        if kind_col is not None and m_type and kind_col < len(row):
+            is_show = row[kind_col].strip().lower() in IMDB_SHOW_TYPES
+            if is_show != (m_type == "show"): continue
+        try:
+            item = make_item(row[title], row[year], {k: row[i] for i, k in id_cols if i < len(row)}, import_ids)
+        except (ValueError, IndexError) as e:
+            errors.add(where, ",".join(row), str(e) or "missing column")
+            continue
+        yield item
+
+JSON_NEXT_LINE_RE = re.compile(r"(?:[ \t\r]*\n)*([ \t]*)(\S)")
+JSON_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|"|[\[\]{},]', re.S)
+JSON_MAX_VALUE = 1 << 20  # characters one element may span before the import gives up on it
+
+def json_element_end(buf, pos):
+    # Index of the ',' or ']' that ends the array element starting at pos, or -1 if it runs past buf
+    depth = 0
+    for m in JSON_TOKEN_RE.finditer(buf, pos):
+        tok = m.group()
+        if tok[0] == '"':
+            if len(tok) == 1: return -1  # unterminated string
+        elif tok in "[{": depth += 1
+        elif depth == 0 and tok in ",]": return m.start()
+        elif tok in "]}": depth = max(0, depth - 1)
+    return -1
+
+def iter_json_values(f, chunk_size=1 << 16, errors=None):
+    # Elements of a top-level JSON array (or JSON Lines), decoded one at a time from fixed-size chunks.
+    # Inside an array a bad element is reported and skipped to the next ',' at its level. Outside an array a
+    # value that won't decode is reported as a bad line and skipped to the next line, unless the following
+    # line is indented or closes a bracket (a multi-line value still being read). Either way one element may
+    # span at most JSON_MAX_VALUE characters, so a broken file fails early instead of buffering to EOF.
+    decoder = json.JSONDecoder()
+    buf, pos, opened, line = "", 0, False, 1
+    while True:
+        chunk = f.read(chunk_size)
+        buf, pos = buf[pos:] + chunk, 0
+        while True:
+            start = pos
+            while pos < len(buf) and buf[pos] in " \t\r\n,": pos += 1
+            line += buf.count("\n", start, pos)
+            if pos >= len(buf): break
+            if buf[pos] == "[" and not opened:
+                opened, pos = True, pos + 1
+                continue
+            if buf[pos] == "]": return
+            try: value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if opened:
+                    end = json_element_end(buf, pos)
+                    if end < 0:
+                        # Cut by the chunk boundary (or unbalanced): read more, within limits
+                        if not chunk or len(buf) - pos > JSON_MAX_VALUE: raise
+                        break
+                    if errors: errors.add(f"line {line}", buf[pos:end].strip(), e.msg)
+                    line += buf.count("\n", pos, end)
+                    pos = end
+                    continue
+                nl = buf.find("\n", pos)
+                nxt = JSON_NEXT_LINE_RE.match(buf, nl + 1) if nl >= 0 else None
+                if chunk and (nxt is None or nxt.group(1) or nxt.group(2) in "}]"):
+                    if len(buf) - pos > JSON_MAX_VALUE: raise
+                    break
+                end = nl if nl >= 0 else len(buf)
+                if errors:
+                    try: json.loads(buf[pos:end])
+                    except json.JSONDecodeError as e: errors.add(f"line {line}", buf[pos:end].strip(), e.msg)
+                pos = end
+                continue
+            if chunk and (end == len(buf) or buf[end] in "eE."): break  # a number may continue in the next chunk
+            line += buf.count("\n", pos, end)
+            pos = end
+            yield value
+        if not chunk: return
+
+def json_item(obj, m_type=None, import_ids=None):
+    # Trakt exports wrap entries as {"movie": {...}} / {"show": {...}}; flat objects use title/name + year
+    for key in ("movie", "show"):
+        if isinstance(obj.get(key), dict):
+            if m_type and key != m_type: return None
+            obj = obj[key]
+            break
+    lowered = {str(k).lower().replace("_", " "): v for k, v in obj.items()}
+    title = next((lowered[c] for c in CSV_TITLE_COLUMNS if lowered.get(c)), None)
+    year = next((lowered[c] for c in CSV_YEAR_COLUMNS if lowered.get(c)), None)
+    if title is None or year is None: raise ValueError("missing title or year")
+    ids = dict(lowered.get("ids") or {}) if isinstance(lowered.get("ids"), dict) else {}
+    ids.update({CSV_ID_COLUMNS[k]: v for k, v in lowered.items() if k in CSV_ID_COLUMNS and v})
+    return make_item(title, year, ids, import_ids)
+
+def iter_json_items(f, m_type=None, import_ids=None, errors=None):
+    for n, value in enumerate(iter_json_values(f, errors=errors), 1):
+        # A single wrapping object ({"items": [...]}) is unpacked; that one case is held in memory
+        values = [value]
+        if n == 1 and isinstance(value, dict) and not any(k in value for k in ("title", "name", "movie", "show")):
+            values = next((v for v in value.values() if isinstance(v, list)), values)
+        for v in values:
+            if not isinstance(v, dict):
+                errors.add(f"entry {n}", v, "not an object")
+                continue
+            try: item = json_item(v, m_type, import_ids)
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.add(f"entry {n}", json.dumps(v)[:80], str(e))
+                continue
+            if item: yield item
+
+def iter_import_file(path, m_type=None, import_ids=None, log=print, fmt=None):
+    # Yields items from a text/CSV/JSON list file; fmt overrides extension/content sniffing
+    errors = RowErrors(log)
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        fmt = fmt or detect_import_format(path, f.read(4096))
+        f.seek(0)
+        log(f"Importing '{os.path.basename(path)}' as {fmt}...")
+        try:
+            if fmt == "csv": yield from iter_csv_items(f, m_type, import_ids, errors)
+            elif fmt == "json": yield from iter_json_items(f, m_type, import_ids, errors)
+            else: yield from iter_list(f, import_ids, log)
+        except (json.JSONDecodeError, csv.Error, UnicodeDecodeError) as e:
+            log(f"Import stopped: {e}")
+    errors.flush()
+    if errors.total: log(f"{errors.total} malformed rows skipped in total.")
+
+# --- TRAKT ---
+TRAKT_API = "https://api.trakt.tv"
+TRAKT_PAGE_SIZE = 100
+
+class TraktCache:
+    # On-disk cache for Trakt: raw pages keyed by URL with their ETag (replayed on 304), and whole list
+    # contents keyed by user/list with the list's updated_at (skips refetching unchanged lists).
+    def __init__(self, path, max_age=30 * 86400):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.data = {"pages": {}, "lists": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f: self.data.update(json.load(f))
+            except Exception as e: print(f"Trakt Cache Error: {e}")
+        now = time.time()
+        for bucket in self.data.values():
+            for key in [k for k, e in bucket.items() if now - e.get("at", 0) > max_age]: del bucket[key]
+
+    def get(self, bucket, key):
+        with self.lock: return self.data[bucket].get(key)
+
+    def put(self, bucket, key, **entry):
+        with self.lock:
+            self.data[bucket][key] = {**entry, "at": time.time()}
+            self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty: return
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w') as f: json.dump(self.data, f)
+            os.replace(tmp, self.path)
+            self.dirty = False
+
+def trakt_entry(e):
+    # List item -> (type, title, year, ids) or None
+    kind = e.get("type")
+    m = e.get(kind) or {}
+    if kind not in ("movie", "show") or not m.get("title") or not m.get("year"): return None
+    return kind, m['title'], m['year'], clean_ids(m.get("ids"))
+
+def trakt_headers(client_id):
+    return {"Content-Type": "application/json", "trakt-api-version": "2", "trakt-api-key": client_id}
+
+# --- PIPELINE ---
+# Bounded-queue stage used by run_process (parse -> match -> tag -> submit). A full inbox blocks the
+# producer (backpressure); once the cancel event is set, put() gives up and workers drain without handling.
+# Handlers always receive a list: single items, or up to `batch` items gathered until the inbox goes idle.
+STAGE_STOP = object()
+
+class OrderedLog:
+    # Emits per-item log lines in the order items were fed, whatever order the stages finish them in.
+    # Only the out-of-order window is buffered; flush() writes whatever is left (e.g. after STOP).
+    def __init__(self, log):
+        self.log = log
+        self.lock = threading.Lock()
+        self.order = deque()
+        self.done = {}
+
+    def expect(self, key):
+        with self.lock: self.order.append(key)
+
+    def finish(self, key, *lines):
+        # lines: (msg, level) pairs, possibly none
+        with self.lock:
+            self.done[key] = lines
+            while self.order and self.order[0] in self.done: self.emit(self.order.popleft())
+
+    def flush(self):
+        with self.lock:
+            while self.order: self.emit(self.order.popleft())
+
+    def emit(self, key):
+        for msg, level in self.done.pop(key, ()): self.log(msg, level)
+
+class ParseProgress:
+    # How far a list's parser has got, shared with the run_job feeding from the same job so it can follow
+    # the parser instead of waiting for the whole list
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.new = 0
+        self.done = False
+
+    def add(self, n):
+        with self.cond:
+            self.new += n
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+
+    def snapshot(self):
+        with self.cond: return self.new, self.done
+
+    def wait_past(self, new, timeout):
+        with self.cond: self.cond.wait_for(lambda: self.new > new or self.done, timeout)
+
+class PipelineStage:
+    def __init__(self, name, handler, cancel, log, workers=1, maxsize=200, batch=1, linger=0.5, profiler=None):
+        self.name = name
+        self.profiler = profiler or Profiler()
+        self.handler = handler
+        self.cancel = cancel
+        self.log = log
+        self.batch = batch
+        self.linger = linger
+        self.inbox = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        self.received = 0
+        self.done = 0
+        self.threads = [threading.Thread(target=self.loop, name=f"{name}-{i}", daemon=True) for i in range(max(1, workers))]
+
+    def start(self):
+        for t in self.threads: t.start()
+        return self
+
+    def put(self, item):
+        while not self.cancel.is_set():
+            try:
+                self.inbox.put(item, timeout=0.2)
+                with self.lock: self.received += 1
+                return True
+            except queue.Full: continue
+        return False
+
+    def close(self):
+        for _ in self.threads: self.inbox.put(STAGE_STOP)
+
+    def join(self):
+        for t in self.threads: t.join()
+
+    def loop(self):
+        pending = []
+        while True:
+            try: item = self.inbox.get(timeout=self.linger if pending else None)
+            except queue.Empty: item = None
+            if item is not None and item is not STAGE_STOP:
+                if not self.cancel.is_set(): pending.append(item)
+                if len(pending) < self.batch: continue
+            if pending:
+                try:
+                    with self.profiler.span(self.name, "stage", items=len(pending)): self.handler(pending)
+                except Exception as e: self.log(f"[{self.name}] Error: {e}")
+                with self.lock: self.done += len(pending)
+                pending = []
+            if item is STAGE_STOP: return
+
+# --- ENGINE ---
+# Collection processing, monitoring and integrations. UI layers hook in through log/on_status/on_change;
+# every callback may fire from a worker thread.
+class MediaEngine:
+    def __init__(self, config=None, log=None, on_status=None, on_change=None, echo=None):
+        self.config = config if config is not None else load_config()
+        self.log_sink = log
+        # Without a UI or callback attached, lines are echoed to stdout (headless/CLI)
+        self.logs = LogSink(echo=log is None if echo is None else echo)
+        self.logs.configure(self.config)
+        self.on_status = on_status
+        self.on_change = on_change
+
+        # Thread Locking & Control
+        self.metrics = Metrics()
+        self.data_lock = TimedLock(self.metrics, "jmc_data_lock")
+        self.profiler = Profiler()
+        self.process_cancel_event = threading.Event()
+        self.monitor_cancel_event = threading.Event()
+        self.sync_cancel_event = threading.Event()  # Trakt syncs; cleared when each sync starts, so a STOP doesn't outlive it
+        self.monitor_running = threading.Event()
+        self.monitor_queue = []  # (target_col, incremental) requests merged into the next scan pass
+        self.monitor_queue_lock = threading.Lock()
+
+        # Plex section indexes (keyed by section name)
+        self.plex_indexes = {}
+        self.plex_index_lock = threading.Lock()
+
+        self.store = load_collections_store()
+        self.store.profiler = self.profiler
+        self.http = HttpClient(metrics=self.metrics, profiler=self.profiler)
+        self.plex = PlexClientManager(self.config, self.http.service("plex").library_session())
+        self.lookup_cache = LookupCache(LOOKUP_CACHE_FILE, config_num(self.config, 'lookup_cache_ttl_hours', 24, float) * 3600)
+        self.webhook_server = None
+        self.webhook_signature = None
+        self.trakt_cache = TraktCache(TRAKT_CACHE_FILE)
+        self.trakt_sync_lock = threading.Lock()
+
+    def log(self, msg, level=None):
+        if self.logs.write(msg, level) and self.log_sink: self.log_sink(msg)
+
+    def status(self, text):
+        if self.on_status: self.on_status(text)
+
+    def write_metrics(self):
+        path = self.config.get('metrics_file')
+        if not path: return
+        try: self.metrics.write(path)
+        except OSError as e: self.log(f"Metrics File Error: {e}")
+
+    @contextlib.contextmanager
+    def profile_run(self, label):
+        # Traces one run when profiling is on (Settings > Profiling, or media_cli.py --profile)
+        if str(self.config.get('profile_enabled', "0")).lower() not in ("1", "true", "yes", "on"):
+            yield
+            return
+        self.profiler.begin(label, config_num(self.config, 'profile_sample_ms', 0, float))
+        try: yield
+        finally: self.export_profile(self.profiler.end())
+
+    def export_profile(self, run):
+        if not run: return
+        label, events, summary = run
+        folder = self.config.get('profile_dir') or "profiles"
+        base = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9._-]+', '_', label)[:60]}")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with open(base + ".trace.json", "w") as f: json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            if summary:
+                with open(base + ".profile.txt", "w") as f: f.write("\n".join(summary) + "\n")
+            self.log(f"[Profile] {len(events)} events written to {base}.trace.json" + (f" (+ {base}.profile.txt)" if summary else ""))
+        except OSError as e: self.log(f"Profile Export Error: {e}")
+
+    def changed(self):
+        if self.on_change: self.on_change()
+
+    def apply_config(self):
+        self.logs.configure(self.config)
+        self.invalidate_plex_index()
+        self.lookup_cache.ttl = config_num(self.config, 'lookup_cache_ttl_hours', 24, float) * 3600
+        if self.webhook_signature != (self.config.get('webhook_port'), self.config.get('webhook_token')): self.start_webhook_server()
+
+    def shutdown(self):
+        self.process_cancel_event.set()
+        self.monitor_cancel_event.set()
+        self.sync_cancel_event.set()
+        if self.webhook_server: self.webhook_server.stop()
+        self.lookup_cache.save()
+        self.trakt_cache.save()
+        self.write_metrics()
+        self.logs.close()
+
+    # --- PLEX ---
+    def get_plex_lib(self, m_type: str):
+        try:
+            return self.plex.section(m_type)
+        except Exception as e:
+            self.log(f"[Plex] Error: {e}")
+            return None
+
+    def get_plex_index(self, lib):
+        with self.plex_index_lock:
+            idx = self.plex_indexes.get(lib.title)
+            if idx is None: idx = self.plex_indexes[lib.title] = PlexLibraryIndex(lib)
+            idx.lib, idx.ttl = lib, config_num(self.config, 'plex_index_ttl', 300)
+            idx.fuzzy_threshold = config_num(self.config, 'fuzzy_threshold', 0.8, float)
+        if not idx.stale(): return idx.ensure()
+        self.log(f"[Plex] Indexing '{lib.title}'...")
+        with self.profiler.span("plex_index", "plex", section=lib.title): return idx.ensure()
+
+    def invalidate_plex_index(self, section_name=None):
+        with self.plex_index_lock:
+            for name, idx in self.plex_indexes.items():
+                if section_name is None or name == section_name: idx.invalidate()
+
+    def tag_collection(self, lib, name, matches, remove=False):
+        # matches: [(item, plex_media)]; returns the pairs that are now tagged with (or, remove=True, untagged from) the collection
+        # Batch multi-edit state lives on the section object, so each call edits through its own shallow copy
+        edit, verb = ("removeCollection", "Untagged") if remove else ("addCollection", "Tagged")
+        tagged, fallback, batches = [], [], 0
+        for start in range(0, len(matches), TAG_BATCH_SIZE):
+            chunk = matches[start:start + TAG_BATCH_SIZE]
+            try:
+                with self.metrics.timer("jmc_plex_tag_seconds", op=edit, mode="batch"), self.profiler.span(edit, "plex", items=len(chunk), collection=name):
+                    getattr(copy.copy(lib).batchMultiEdits([m for _, m in chunk]), edit)(name).saveMultiEdits()
+                tagged.extend(chunk)
+                batches += 1
+            except Exception as e:
+                self.log(f"[Plex] Batch tag failed for {len(chunk)} items in '{name}' ({e}); tagging one by one.", "warning")
+                fallback.extend(chunk)
+
+        # Singles go through a one-item multi-edit too: the item's own addCollection would rewrite its whole
+        # collection list from the partial index object, dropping collections the listing didn't include
+        for item, m in fallback:
+            try:
+                with self.metrics.timer("jmc_plex_tag_seconds", op=edit, mode="single"), self.profiler.span(edit, "plex", title=item['title'], collection=name):
+                    getattr(copy.copy(lib).batchMultiEdits([m]), edit)(name).saveMultiEdits()
+                tagged.append((item, m))
+            except Exception as e: self.log(f"Plex tag error {item['title']}: {e}")
+        self.metrics.inc("jmc_plex_tagged_items_total", len(tagged), op=edit)
+
+        if len(matches) > 1:
+            self.log(f"[Plex] {verb} {len(tagged)}/{len(matches)} items {'from' if remove else 'into'} '{name}' ({batches} batch + {len(fallback)} single requests).")
+        return tagged
+
+    # --- PROCESS LOGIC ---
+    def run_process(self, col, m_type, items, cancel=None):
+        # items may be any iterable (e.g. a generator over a file); the calling thread is the parse stage and
+        # the pipeline runs on a job thread from the first stored chunk on. cancel defaults to
+        # process_cancel_event (the STOP button).
+        try:
+            if not col: 
+                self.log("Error: Missing Name or valid items.")
+                return
+
+            with self.data_lock:
+                existing_type = self.store.collection_type(col)
+                if existing_type is not None and existing_type != m_type:
+                    self.log(f"[ERROR] Mismatch! '{col}' is {existing_type}. Cannot add {m_type}.")
+                    return 
+
+            with self.profile_run(f"process-{col}"):
+                progress, runners = ParseProgress(), []
+
+                def run(job_id):
+                    try: self.run_job(job_id, col, m_type, cancel, progress)
+                    except Exception as e: self.log(f"Process Error: {e}")
+
+                def start_job(job_id):
+                    runners.append(threading.Thread(target=run, args=(job_id,), name=f"job-{job_id}", daemon=True))
+                    runners[-1].start()
+
+                try:
+                    with self.profiler.span("Parse", "stage"): parsed, new = self.queue_items(col, m_type, existing_type, items, progress, start_job)
+                finally: progress.finish()
+                if not parsed: self.log("Error: Missing Name or valid items.")
+                elif not new: self.log("No new items to process.")
+                else: self.log(f"Merging: Added {new} new items." if existing_type else f"Created '{col}' with {new} items.")
+                for t in runners: t.join()
+        except Exception as e: self.log(f"Process Error: {e}")
+
+    def queue_items(self, col, m_type, existing_type, items, progress, on_job):
+        # Stores every new item as a queued job item -> (parsed, new). The whole list is checkpointed even while
+        # (and after) the pipeline works on it, or after STOP, so a cancel or crash never loses the unparsed
+        # remainder. The collection and job are only created once there is something new to put in them;
+        # on_job(job_id) is called right after, and progress reports every stored chunk.
+        state = {"job_id": None, "parsed": 0, "new": 0}
+        chunk = []
+
+        def flush_chunk():
+            # Duplicates are checked per chunk against the store (earlier chunks included), so memory
+            # stays flat however long the list is.
+            fresh, id_updates, created = {}, {}, False
+            with self.data_lock:
+                stored = {(i['title'].lower(), i['year']): i for i in self.store.items_by_title_keys(col, {normalize_title(i['title']) for i in chunk})}
+                for item in chunk:
+                    key = (item['title'].lower(), item['year'])
+                    old = stored.get(key) or fresh.get(key)
+                    if old is None:
+                        fresh[key] = item
+                        continue
+                    if item.get('ids') and not item['ids'].items() <= old.get('ids', {}).items():
+                        old['ids'] = {**item['ids'], **old.get('ids', {})}
+                        if old.get('id'): id_updates[old['id']] = old
+                new = list(fresh.values())
+                if new and state["job_id"] is None:
+                    if existing_type is None: self.store.create_collection(col, m_type)
+                    state["job_id"], created = self.store.create_job(col, m_type), True
+                self.store.add_items(col, new)
+                if new: self.store.add_job_items(state["job_id"], new)
+                self.store.update_items(list(id_updates.values()))
+            state["new"] += len(new)
+            progress.add(len(new))
+            chunk.clear()
+            if created:
+                self.changed()
+                on_job(state["job_id"])
+
+        for item in items:
+            state["parsed"] += 1
+            chunk.append(item)
+            if len(chunk) >= TAG_BATCH_SIZE: flush_chunk()
+        if chunk: flush_chunk()
+        if state["new"]: self.changed()
+        return state["parsed"], state["new"]
+
+    def resume_jobs(self, job_ids=None):
+        # Picks up open jobs (STOP, crash or closed window) from their last checkpoint
+        for job_id, col, m_type, _, _, stages in self.store.jobs(status="open"):
+            if job_ids is not None and job_id not in job_ids: continue
+            if self.process_cancel_event.is_set(): break
+            todo = sum(stages.get(st, 0) for st in JOB_OPEN_STAGES)
+            if not todo:
+                self.store.set_job_status(job_id, "done")
+                continue
+            self.log(f"Resuming job #{job_id} for '{col}': {todo} unfinished items.")
+            try:
+                with self.profile_run(f"resume-{job_id}-{col}"): self.run_job(job_id, col, m_type)
+            except Exception as e: self.log(f"Process Error: {e}")
+
+    def retry_failed(self, col=None):
+        job_ids = self.store.requeue_failed(col)
+        if not job_ids:
+            self.log("No failed items to retry.")
+            return
+        self.resume_jobs(set(job_ids))
+
+    def run_job(self, job_id, col, m_type, cancel=None, progress=None):
+        # Streams a job's unfinished items from the store through match -> tag -> submit (missing items go
+        # straight to submit). Every stage transition is checkpointed in job_items. With progress (a list still
+        # being parsed into the job) the feed follows the parser until it finishes.
+        cancel = cancel or self.process_cancel_event
+        lib = self.get_plex_lib(m_type)
+        service = "Radarr" if m_type == "movie" else "Sonarr"
+        arr_enabled = bool(self.config.get(f"{service.lower()}_url"))
+        submitter, submitter_lock = [], threading.Lock()
+        started = time.perf_counter()
+        results = OrderedLog(self.log)  # keyed by item id; job items are fed in id order
+        counts = {"parsed": 0, "found": 0, "missed": 0, "added": 0, "skipped": 0, "not_found": 0, "error": 0, "failed": 0}
+        count_lock = threading.Lock()
+
+        def bump(key, n=1):
+            with count_lock: counts[key] += n
+
+        def report():
+            self.status(f"Parsed {counts['parsed']} | Matched {match.done}/{match.received} | "
+                        f"Tagged {counts['found']} | Submitted {submit_stage.done}/{submit_stage.received}")
+
+        def to_submit(item):
+            if arr_enabled: return submit_stage.put(item)
+            schedule_recheck(item, "not_in_plex", self.config)
+            self.store.update_items([item])
+            self.store.set_job_stages(job_id, [(item, "waiting", None)])
+            results.finish(item['id'])
+            return True
+
+        def do_match(batch):
+            # Checkpoint before handing items downstream so a later stage's result is never overwritten
+            matched = [(item, self.find_plex(lib, item['title'], item['year'], item.get('ids'), item.get('rating_key'))) for item in batch]
+            self.store.set_job_stages(job_id, [(item, "matched" if found else "missing", None) for item, found in matched if found or arr_enabled])
+            for item, found in matched:
+                if found: tag.put((item, found))
+                else:
+                    bump("missed")
+                    to_submit(item)
+            report()
+
+        def do_tag(batch):
+            done = self.tag_collection(lib, col, batch)
+            for item, m in done: remember_match(item, m)
+            done_ids = {item['id'] for item, _ in done}
+            for item, _ in batch: results.finish(item['id'], *([(f" -> Found: {item['title']}", "debug")] if item['id'] in done_ids else []))
+            self.store.update_items([item for item, _ in done])
+            self.store.set_job_stages(job_id, [(item, "tagged" if item['id'] in done_ids else "failed", None if item['id'] in done_ids else "Plex tag failed") for item, _ in batch])
+            bump("found", len(done))
+            bump("failed", len(batch) - len(done))
+            self.changed()
+            report()
+
+        def do_submit(batch):
+            # The downloader library snapshot loads on the first miss, overlapping with Plex matching
+            with submitter_lock:
+                if not submitter: submitter.append(self.arr_submitter(m_type))
+            stages = []
+            for item in batch:
+                if cancel.is_set(): break
+                try: status, msg = submitter[0](item)
+                except Exception as e: status, msg = "error", f"{service} Error: {e}"
+                bump("not_found" if status == "missed" else status)
+                if status == "error": bump("failed")
+                schedule_recheck(item, ARR_STATES[status], self.config, reset=status == "added")
+                stages.append((item, ARR_JOB_STAGES[status], msg.strip() if status == "error" else None))
+                results.finish(item['id'], (msg, "error" if status == "error" else "debug"))
+            self.store.update_items([item for item, _, _ in stages])
+            self.store.set_job_stages(job_id, stages)
+            report()
+
+        # Stage concurrency: Plex lookups run against the in-memory index, tagging is one batching
+        # writer, and downloader calls get the arr_workers pool.
+        match = PipelineStage("Match", do_match, cancel, self.log, workers=config_num(self.config, 'match_workers', 2), batch=50, linger=0.2, profiler=self.profiler)
+        tag = PipelineStage("Tag", do_tag, cancel, self.log, batch=TAG_BATCH_SIZE, profiler=self.profiler)
+        submit_stage = PipelineStage(service, do_submit, cancel, self.log, workers=config_num(self.config, 'arr_workers', 4), profiler=self.profiler)
+        stages = [match, tag, submit_stage] if lib else []
+        for stage in stages: stage.start()
+
+        # Without a Plex connection items stay queued; the job stays open and resumes next time
+        with self.profiler.span("Feed", "stage"):
+            last, feeding = 0, bool(stages)
+            while feeding:
+                # Read how far the parser got before the page, so rows stored meanwhile are picked up next pass
+                known, parsed_all = progress.snapshot() if progress else (0, True)
+                for item, stage in self.store.job_items(job_id, JOB_OPEN_STAGES, after=last):
+                    last = item['id']
+                    bump("parsed")
+                    if item['found']:
+                        self.store.set_job_stages(job_id, [(item, "tagged", None)])
+                        continue
+                    results.expect(item['id'])
+                    if not (to_submit(item) if stage == "missing" else match.put(item)):
+                        feeding = False
+                        break
+                if parsed_all or cancel.is_set(): break
+                progress.wait_past(known, 0.5)
+
+        # Drain in pipeline order so every stage sees its producer's last item before stopping
+        if stages:
+            match.close(); match.join()
+            tag.close(); submit_stage.close()
+            tag.join(); submit_stage.join()
+            results.flush()
+            self.lookup_cache.save()
+            report()
+
+        if stages and not counts['parsed']: self.log("No new items to process.")
+        elif stages:
+            self.log(f"Plex: {counts['found']} tagged, {counts['missed']} not in Plex.")
+            if arr_enabled:
+                self.log(f"[{service}] Summary: {counts['added']} added, {counts['skipped']} skipped, {counts['not_found']} missed, {counts['error']} errors")
+        if counts['failed']: self.log(f"{counts['failed']} items failed; use 'Retry Failed Items' to resend only those.")
+
+        job_stages = self.store.job_stage_counts(job_id)
+        still_open = sum(job_stages.get(st, 0) for st in JOB_OPEN_STAGES)
+        if not still_open: self.store.set_job_status(job_id, "done")
+        self.metrics.observe("jmc_process_run_seconds", time.perf_counter() - started)
+        for result in ("found", "missed", "added", "skipped", "not_found", "error"):
+            if counts[result]: self.metrics.inc("jmc_process_items_total", counts[result], result=result)
+        self.write_metrics()
+        self.changed()
+        self.status("Ready")
+        
+        for line in self.http.summary_lines(): self.log(line)
+        if cancel.is_set(): self.log(f"Operation Cancelled. Job #{job_id} will resume on next start.")
+        elif still_open: self.log(f"Job #{job_id} still open ({still_open} unfinished items), will resume on next start.")
+        else: self.log("Complete.")
+
+    # --- MATCHING ---
+    def find_plex(self, lib, title, year, ids=None, rating_key=None):
+        try:
+            with self.profiler.span("find_plex", "plex", title=title):
+                return self.match_in_index(self.get_plex_index(lib), title, year, ids, rating_key)
+        except Exception as e:
+            self.log(f"Search Error: {e}")
+            self.plex.reset()
+            return None
+
+    def match_in_index(self, idx, title, year, ids=None, rating_key=None):
+        start = time.perf_counter()
+        m, how = idx.lookup(title, year, ids, rating_key)
+        if not m:
+            hits = idx.fuzzy(title, year)
+            if hits:
+                score, m = hits[0]
+                how = "fuzzy"
+                others = ", ".join(f"'{o.title}' ({sc:.2f})" for sc, o in hits[1:])
+                self.log(f"[Fuzzy Match] '{title}' -> '{m.title}' ({score:.2f})" + (f" | also: {others}" if others else ""), "debug")
+        self.metrics.observe("jmc_plex_lookup_seconds", time.perf_counter() - start,
+                             **{"pass": ("guid" if how in EXTERNAL_ID_KEYS else how) if m else "miss"})
+        return m
+
+    # --- RADARR / SONARR ---
+    def arr_submitter(self, m_type):
+        # per-item submit fn returning (status, message), or None when the downloader isn't configured
+        return self.radarr_submitter() if m_type == "movie" else self.sonarr_submitter()
+
+    def load_arr_library(self, service, url, head, endpoint, id_key):
+        try:
+            resp = self.http.service(service).get(f"{url}/api/v3/{endpoint}", headers=head, timeout=60, endpoint="library")
+            if resp.status_code == 200:
+                index = ArrLibraryIndex(resp.json(), id_key)
+                self.log(f"[{service.capitalize()}] Library snapshot: {len(index.ids)} titles.")
+                return index
+            self.log(f"[{service.capitalize()} Error] Library fetch failed: {resp.status_code}")
+        except Exception as e: self.log(f"{service.capitalize()} Error: {e}")
+        return ArrLibraryIndex([], id_key)
+
+    def cached_lookup(self, service, url, head, endpoint, term):
+        look = self.lookup_cache.get(service, term)
+        if look is not None: return look, None
+        resp = self.http.service(service).get(f"{url}/api/v3/{endpoint}?term={quote_plus(term)}", headers=head, timeout=15, endpoint="lookup")
+        if resp.status_code != 200: return None, resp.status_code
+        return self.lookup_cache.put(service, term, resp.json()), None
+
+    def radarr_submitter(self):
+        url = (self.config.get('radarr_url') or '').rstrip('/')
+        head = {"X-Api-Key": self.config.get('radarr_key') or ''}
+        if not url: return None
+        have = self.load_arr_library("radarr", url, head, "movie", "tmdbId")
+
+        def _submit(m):
+            ids = m.get('ids', {})
+            if have.has(m['title'], m['year'], ids.get('tmdb')): return "skipped", f"  [Radarr Skip] {m['title']}"
+            term = f"tmdb:{ids['tmdb']}" if 'tmdb' in ids else f"imdb:{ids['imdb']}" if 'imdb' in ids else f"{m['title']} {m['year']}"
+            look, err = self.cached_lookup("radarr", url, head, "movie/lookup", term)
+            if err: return "error", f"[Radarr Error] Lookup failed: {err}"
+            if not look: return "missed", f"  [Radarr Miss] {m['title']}"
+            c = next((x for x in look if x.get('year') == m['year']), look[0])
+            if c.get("id") or have.has(ext_id=c.get("tmdbId")): return "skipped", f"  [Radarr Skip] {m['title']}"
+            pl = {"tmdbId": c.get("tmdbId"), "title": c.get("title"), "year": c.get("year"), "qualityProfileId": int(self.config['radarr_profile']), "rootFolderPath": self.config['radarr_root'], "monitored": True, "addOptions": {"searchForMovie": True}}
+
+            resp = self.http.service("radarr").post(f"{url}/api/v3/movie", headers=head, json=pl, timeout=15, endpoint="add")
+            if resp.status_code == 201:
+                have.add(c)
+                return "added", f"  [Radarr Added] {m['title']}"
+            return "error", f"  [Radarr Error] {m['title']} ({resp.status_code}: {resp.text[:100]})"
+
+        return _submit
+
+    def sonarr_submitter(self):
+        url = (self.config.get('sonarr_url') or '').rstrip('/')
+        head = {"X-Api-Key": self.config.get('sonarr_key') or ''}
+        if not url: return None
+        have = self.load_arr_library("sonarr", url, head, "series", "tvdbId")
+
+        def _submit(s):
+            ids = s.get('ids', {})
+            if have.has(s['title'], s['year'], ids.get('tvdb')): return "skipped", f"  [Sonarr Skip] {s['title']}"
+            term = f"tvdb:{ids['tvdb']}" if 'tvdb' in ids else s['title']
+            look, err = self.cached_lookup("sonarr", url, head, "series/lookup", term)
+            if err: return "error", f"[Sonarr Error] Lookup failed: {err}"
+            if not look: return "missed", f"  [Sonarr Miss] {s['title']}"
+            c = next((x for x in look if x.get('year') == s['year']), look[0])
+            if c.get("id") or have.has(ext_id=c.get("tvdbId")): return "skipped", f"  [Sonarr Skip] {s['title']}"
+            pl = {"tvdbId": c.get("tvdbId"), "title": c.get("title"), "titleSlug": c.get("titleSlug"), "qualityProfileId": int(self.config['sonarr_profile']), "rootFolderPath": self.config['sonarr_root'], "monitored": True, "addOptions": {"searchForMissingEpisodes": True}}
+            resp = self.http.service("sonarr").post(f"{url}/api/v3/series", headers=head, json=pl, timeout=15, endpoint="add")
+            if resp.status_code == 201:
+                have.add(c)
+                return "added", f"  [Sonarr Added] {s['title']}"
+            return "error", f"  [Sonarr Error] {s['title']} ({resp.status_code}: {resp.text[:100]})"
+
+        return _submit
+
+    # --- MONITOR ---
+    def scan_index(self, lib, scan_state, full):
+        # -> (index, new watermark, arrivals). Incremental passes fold Plex's arrivals into the cached section index.
+        wm = scan_state['watermarks'].get(lib.title)
+        with self.plex_index_lock: idx = self.plex_indexes.get(lib.title)
+        if full or wm is None or idx is None or not idx.built_at:
+            idx = self.get_plex_index(lib)
+            arrivals = [m for m in list(idx.by_rating_key.values()) if wm is not None and getattr(m, 'addedAt', None) and m.addedAt.timestamp() > wm]
+            return idx, max(wm or 0, idx.max_added_at), arrivals
+        arrivals = lib.search(filters={"addedAt>>": datetime.fromtimestamp(wm)})
+        self.log(f"[Incremental] {lib.title}: {len(arrivals)} new since last scan.")
+        idx.lib = lib
+        idx.extend(arrivals)
+        return idx, max(wm, idx.max_added_at), arrivals
+
+    def run_monitor(self, target_col=None, incremental=False):
+        # Requests that arrive while a scan is running are queued and merged into the next pass instead of dropped
+        with self.monitor_queue_lock:
+            self.monitor_queue.append((target_col, incremental))
+            if self.monitor_running.is_set():
+                self.log(f"Scan in progress; queued {'re-scan of ' + repr(target_col) if target_col else 'scan'}.")
+                return
+            self.monitor_running.set()
+
+        try:
+            while True:
+                with self.monitor_queue_lock:
+                    if not self.monitor_queue:
+                        self.monitor_running.clear()
+                        return
+                    batch, self.monitor_queue = self.monitor_queue, []
+                if self.monitor_cancel_event.is_set(): continue
+                everything = any(t is None and not inc for t, inc in batch)
+                scheduled = not everything and any(t is None for t, _ in batch)
+                with self.profile_run("scan"): self.scan_pass(None if everything else {t for t, _ in batch if t is not None}, scheduled)
+        except BaseException:
+            with self.monitor_queue_lock: self.monitor_running.clear()
+            raise
+
+    def scan_pass(self, targets=None, scheduled=False):
+        # targets=None checks every pending item. Otherwise the named collections are checked in full and, if
+        # scheduled, every item whose recheck is due (capped by scan_budget) plus anything that just arrived in Plex.
+        try:
+            now, started = time.time(), time.perf_counter()
+            scan_state = self.store.get_meta("scan", {"watermarks": {}, "last_full": 0})
+            rows = self.store.pending_items() if targets is None else []
+            if scheduled: rows += self.store.due_items(now, max(1, config_num(self.config, 'scan_budget', 500)))
+            for name in targets or (): rows += self.store.pending_items(name)
+            types = self.store.pending_types() if scheduled else {m_type for _, m_type, _ in rows}
+
+            # Scheduled passes only look at what Plex added since the last watermark; a periodic full pass is the safety net
+            periodic = scheduled and now - scan_state.get("last_full", 0) > config_num(self.config, 'full_scan_hours', 24, float) * 3600
+            full = targets is None or bool(targets) or periodic
+            if periodic: self.invalidate_plex_index()
+            self.log("Scanning Plex..." if full else "Scanning Plex (incremental)...")
+
+            workers = max(1, config_num(self.config, 'plex_workers', 4))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plex") as pool:
+                # Sections are fetched/indexed side by side
+                sections = {t: pool.submit(lambda t: self.scan_index(self.plex.section(t), scan_state, full), t) for t in types}
+                indexes = {}
+                for m_type, fut in sections.items():
+                    idx, wm, arrivals = fut.result()
+                    indexes[m_type] = (idx.lib.title, idx, wm)
+                    if scheduled and arrivals:
+                        keys = {normalize_title(n) for m in arrivals for n in (m.title, getattr(m, 'originalTitle', None)) if n}
+                        rows += self.store.pending_by_title_keys(m_type, keys)
+
+                # One lookup per unique (type, title, year); the match fans out to every collection that wants it
+                wanted, seen = {}, set()
+                for name, m_type, item in rows:
+                    if m_type not in indexes or item['id'] in seen: continue
+                    seen.add(item['id'])
+                    wanted.setdefault((m_type, normalize_title(item['title']), item['year']), []).append((name, item))
+                if rows: self.log(f"[Monitor] {len(seen)} pending items to check -> {len(wanted)} unique lookups.")
+
+                matches, unmatched = {}, []
+                resolving = [pool.submit(self.resolve_keys, indexes[t][1], [(k, o) for k, o in wanted.items() if k[0] == t]) for t in indexes]
+                for fut in resolving:
+                    found, missed = fut.result()
+                    for name, (lib, pairs) in found.items(): matches.setdefault(name, (lib, []))[1].extend(pairs)
+                    unmatched += missed
+
+                # Collections are tagged concurrently (bounded by plex_workers); results are committed in batches
+                pending_commit, arrived = [], 0
+                tagging = {pool.submit(self.tag_collection, lib, name, col_matches): name for name, (lib, col_matches) in matches.items()}
+                for fut, name in tagging.items():
+                    if self.monitor_cancel_event.is_set(): fut.cancel(); continue
+                    for item, f in fut.result():
+                        remember_match(item, f)
+                        pending_commit.append(item)
+                        arrived += 1
+                        self.log(f"New Arrival: {item['title']} -> {name}")
+                    if len(pending_commit) >= TAG_BATCH_SIZE: self.commit_items(pending_commit)
+
+            # Back off everything that was looked up and still isn't in Plex; keep any downloader state
+            for item in unmatched: schedule_recheck(item, item.get('last_seen_state') or "not_in_plex", self.config, now=now)
+            self.commit_items(pending_commit + unmatched)
+
+            if (targets is None or scheduled) and not self.monitor_cancel_event.is_set():
+                for section, _, wm in indexes.values(): scan_state['watermarks'][section] = wm
+                if targets is None or periodic: scan_state['last_full'] = time.time()
+                self.store.set_meta("scan", scan_state)
+
+            kind = "full" if full else "incremental"
+            self.metrics.inc("jmc_monitor_scans_total", kind=kind)
+            self.metrics.observe("jmc_monitor_scan_seconds", time.perf_counter() - started, kind=kind)
+            self.metrics.inc("jmc_monitor_items_checked_total", len(seen))
+            self.metrics.inc("jmc_monitor_items_found_total", arrived)
+            self.metrics.set("jmc_monitor_last_scan_items", len(seen))
+            self.metrics.set("jmc_monitor_last_scan_timestamp_seconds", round(time.time()))
+            self.write_metrics()
+            self.changed()
+            self.log("Scan complete.")
+        except Exception as e:
+            self.log(f"Monitor Error: {e}")
+            self.plex.reset()
+
+    def resolve_keys(self, idx, keyed_owners):
+        # -> ({collection: (lib, [(item, media)])}, [unmatched items]) for one section's unique lookup keys
+        matches, unmatched = {}, []
+        if not len(idx): return matches, unmatched
+        for (_, _, year), owners in keyed_owners:
+            if self.monitor_cancel_event.is_set(): break
+            ids = {k: v for _, item in owners for k, v in item.get('ids', {}).items()}
+            rating_key = next((item['rating_key'] for _, item in owners if item.get('rating_key')), None)
+            with self.profiler.span("find_plex", "plex", title=owners[0][1]['title'], owners=len(owners)):
+                f = self.match_in_index(idx, owners[0][1]['title'], year, ids, rating_key)
+            if not f:
+                unmatched += [item for _, item in owners]
+                continue
+            for name, item in owners: matches.setdefault(name, (idx.lib, []))[1].append((item, f))
+        return matches, unmatched
+
+    def commit_items(self, items):
+        with self.data_lock: self.store.update_items(items)
+        del items[:]
+
+    def poll_interval_minutes(self):
+        # With webhooks pushing arrivals, polling is only a fallback
+        if self.webhook_server: return max(1.0, config_num(self.config, 'webhook_fallback_minutes', 60, float))
+        return max(1.0, config_num(self.config, 'auto_scan_minutes', 10, float))
+
+    # --- RECONCILE ---
+    # Checks each Plex collection against its list by membership instead of per-item searches: one collections
+    # listing per section, one member fetch per collection, then bulk multi-edits for the difference.
+    def reconcile_collections(self, names=None, dry_run=False):
+        totals = {"added": 0, "removed": 0, "found": 0, "lost": 0}
+        todo = [(n, t) for n, t, _, _ in self.store.summaries() if names is None or n in names]
+        if not todo:
+            self.log("Nothing to reconcile.")
+            return totals
+        self.status("Reconciling with Plex...")
+        for m_type in sorted({t for _, t in todo}):
+            lib = self.get_plex_lib(m_type)
+            if not lib: continue
+            try:
+                existing = {c.title: c for c in lib.collections()}
+                for name in sorted(n for n, t in todo if t == m_type):
+                    if self.monitor_cancel_event.is_set(): break
+                    for k, v in self.reconcile_collection(lib, name, existing.get(name), dry_run).items(): totals[k] += v
+            except Exception as e:
+                self.log(f"Reconcile Error: {e}")
+                self.plex.reset()
+        if len(todo) > 1:
+            self.log(f"[Reconcile] {'Would add' if dry_run else 'Added'} {totals['added']}, {'remove' if dry_run else 'removed'} {totals['removed']} "
+                     f"across {len(todo)} collections; {totals['found']} items newly found, {totals['lost']} no longer in Plex.")
+        self.write_metrics()
+        self.changed()
+        self.status("Ready")
+        return totals
+
+    def reconcile_collection(self, lib, name, plex_col, dry_run=False):
+        if plex_col is not None and plex_col.smart:
+            self.log(f"[Reconcile] '{name}' is a smart collection in Plex; skipped.", "warning")
+            return {}
+        members = plex_col.items() if plex_col is not None else []
+        for m in members:
+            if hasattr(m, '_autoReload'): m._autoReload = False
+        idx = self.get_plex_index(lib)
+        if any(str(m.ratingKey) not in idx.by_rating_key for m in members):
+            # Members the index hasn't seen yet: refresh once so they can't be mistaken for strays
+            idx.invalidate()
+            idx = self.get_plex_index(lib)
+
+        # Resolve the list against the in-memory index; the first list item per Plex title claims it
+        wanted, changed, newly, lost = {}, {}, [], 0
+        for item in self.store.items(name):
+            with self.profiler.span("find_plex", "plex", title=item['title']):
+                m = self.match_in_index(idx, item['title'], item['year'], item.get('ids'), item.get('rating_key'))
+            if m:
+                wanted.setdefault(str(m.ratingKey), (item, m))
+                if not item['found']: newly.append(item)
+                if not item['found'] or item.get('rating_key') != str(m.ratingKey):
+                    remember_match(item, m)
+                    changed[item['id']] = item
+            elif item['found']:
+                item['found'] = False
+                schedule_recheck(item, "not_in_plex", self.config, reset=True)
+                changed[item['id']] = item
+                lost += 1
+
+        # Members that no list item resolves to are duplicates (same GUID as a wanted title) or strays
+        member_keys = {str(m.ratingKey) for m in members}
+        wanted_guids = {g for _, m in wanted.values() for g in (f"{k}://{v}" for k, v in plex_guid_ids(m).items())}
+        to_add = [pair for rk, pair in wanted.items() if rk not in member_keys]
+        to_remove = [({"title": m.title}, m) for m in members if str(m.ratingKey) not in wanted]
+        dupes = sum(1 for _, m in to_remove if any(f"{k}://{v}" in wanted_guids for k, v in plex_guid_ids(m).items()))
+
+        if dry_run:
+            self.log(f"[Reconcile] '{name}': would add {len(to_add)}, remove {len(to_remove)} ({dupes} duplicates); "
+                     f"{len(newly)} items to mark found, {lost} no longer in Plex.")
+            return {"added": len(to_add), "removed": len(to_remove), "found": len(newly), "lost": lost}
+
+        added = self.tag_collection(lib, name, to_add) if to_add else []
+        removed = self.tag_collection(lib, name, to_remove, remove=True) if to_remove else []
+        added_ids = {item['id'] for item, _ in added}
+        for item, _ in to_add:
+            if item['id'] in added_ids: continue
+            # Failed adds stay pending so the monitor retries them
+            item['found'] = False
+            changed[item['id']] = item
+        found = sum(1 for item in newly if item['found'])
+        self.commit_items(list(changed.values()))
+        self.log(f"[Reconcile] '{name}': {len(members)} in Plex, {len(wanted)} wanted; added {len(added)}, removed {len(removed)} "
+                 f"({dupes} duplicates); {found} items marked found, {lost} no longer in Plex.")
+        return {"added": len(added), "removed": len(removed), "found": found, "lost": lost}
+
+    # --- WEBHOOKS ---
+    def start_webhook_server(self):
+        self.webhook_signature = (self.config.get('webhook_port'), self.config.get('webhook_token'))
+        if self.webhook_server:
+            self.webhook_server.stop()
+            self.webhook_server = None
+        port = config_num(self.config, 'webhook_port', 0)
+        if port <= 0: return
+        try:
+            self.webhook_server = WebhookServer(port, self.handle_media_event, self.log, self.config.get('webhook_token') or "", self.metrics.prometheus)
+            self.log(f"[Webhook] Listening on port {port}.")
+        except OSError as e: self.log(f"[Webhook] Cannot listen on port {port}: {e}")
+
+    def pending_for_event(self, ev):
+        key = normalize_title(ev['title'])
+        hits = []
+        for name, _, item in self.store.pending_items(m_type=ev['m_type']):
+            item_ids = item.get('ids', {})
+            if any(item_ids.get(k) == v for k, v in ev['ids'].items()) or (normalize_title(item['title']) == key and ev['year'] in (None, item['year'])):
+                hits.append((name, item))
+        return hits
+
+    def handle_media_event(self, ev, attempt=0):
+        if not attempt: self.metrics.inc("jmc_webhook_events_total", source=ev['source'])
+        hits = self.pending_for_event(ev)
+        if not hits: return
+        m = None
+        try:
+            if ev['rating_key']:
+                m = self.plex.connect().fetchItem(int(ev['rating_key']))
+            else:
+                lib = self.plex.section(ev['m_type'])
+                idx = PlexLibraryIndex(lib, ttl=0, fuzzy_threshold=config_num(self.config, 'fuzzy_threshold', 0.8, float))
+                idx.rebuild(lib.search(title=ev['title']))
+                m = self.match_in_index(idx, ev['title'], ev['year'], ev['ids'])
+        except Exception as e:
+            self.log(f"[Webhook] Plex Error: {e}")
+            self.plex.reset()
+        if m is None:
+            if attempt < len(WEBHOOK_RETRY_DELAYS):
+                self.log(f"[Webhook] {ev['source']}: '{ev['title']}' not in Plex yet; retrying in {WEBHOOK_RETRY_DELAYS[attempt]}s.")
+                threading.Timer(WEBHOOK_RETRY_DELAYS[attempt], self.handle_media_event, args=(ev, attempt + 1)).start()
+            return
+
+        tagged = set()
+        for name in {n for n, _ in hits}:
+            try:
+                m.addCollection(name)
+                tagged.add(name)
+            except Exception as e: self.log(f"Tag error: {e}")
+        arrived = [item for name, item in hits if name in tagged]
+        for name, item in hits:
+            if name not in tagged: continue
+            remember_match(item, m)
+            self.log(f"New Arrival ({ev['source']}): {item['title']} -> {name}")
+        self.store.update_items(arrived)
+        self.changed()
+
+
+    # --- TRAKT ---
+    def trakt_get(self, path, params=None):
+        # -> (json, pagination headers) or (None, None). Sends the cached ETag and replays the cached body on 304.
+        url = f"{TRAKT_API}{path}" + (f"?{urlencode(params)}" if params else "")
+        head = trakt_headers(self.config.get("trakt_client_id"))
+        cached = self.trakt_cache.get("pages", url)
+        if cached: head["If-None-Match"] = cached["etag"]
+        endpoint = "search" if path.startswith("/search") else "list_items" if path.endswith("/items") else "list"
+        resp = self.http.service("trakt").get(url, headers=head, timeout=15, endpoint=endpoint)
+        if resp.status_code == 304 and cached: return cached["body"], cached["headers"]
+        if resp.status_code != 200:
+            self.log(f"Trakt Error: {resp.status_code} ({path})")
+            return None, None
+        body = resp.json()
+        headers = {k.lower(): v for k, v in resp.headers.items() if k.lower().startswith("x-pagination")}
+        if resp.headers.get("ETag"): self.trakt_cache.put("pages", url, etag=resp.headers["ETag"], body=body, headers=headers)
+        return body, headers
+
+    def trakt_pages(self, path, params=None):
+        # Yields (rows, page, page_count) until the last page or trakt_max_pages
+        max_pages = max(1, config_num(self.config, 'trakt_max_pages', 20))
+        page = 1
+        while True:
+            body, headers = self.trakt_get(path, {**(params or {}), "page": page, "limit": TRAKT_PAGE_SIZE})
+            if body is None: return
+            count = int(headers.get("x-pagination-page-count") or 1)
+            yield body, page, count
+            if page >= count: return
+            if page >= max_pages:
+                self.log(f"[Trakt] Stopped after {max_pages} of {count} pages (Settings > Trakt Max Pages).")
+                return
+            page += 1
+
+    def trakt_search(self, query, on_rows=None):
+        rows = []
+        for body, page, count in self.trakt_pages("/search/list", {"query": query}):
+            page_rows = []
+            for item in body:
+                lst = item.get("list", {})
+                page_rows.append((lst.get("name"), lst.get("likes", 0), lst.get("item_count"), f"{lst.get('user', {}).get('ids', {}).get('slug')}|{lst.get('ids', {}).get('trakt')}"))
+            rows += page_rows
+            if on_rows: on_rows(page_rows)
+            self.status(f"Trakt search: page {page}/{count}")
+        self.trakt_cache.save()
+        self.status("Ready")
+        return rows
+
+    def trakt_list_summary(self, user, list_id):
+        body, _ = self.trakt_get(f"/users/{user}/lists/{list_id}")
+        return body
+
+    def trakt_list_name(self, user, list_id):
+        return (self.trakt_list_summary(user, list_id) or {}).get("name")
+
+    def trakt_list_items(self, user, list_id, m_type, on_page=None, summary=None):
+        # -> [(title, year, ids)] or None on error. Pages stream to on_page as they arrive; an unchanged
+        # list (same updated_at) is served from the on-disk cache without fetching its items.
+        summary = summary or self.trakt_list_summary(user, list_id) or {}
+        key = f"{user}/{list_id}"
+        cached = self.trakt_cache.get("lists", key)
+        if cached and summary.get("updated_at") and cached["updated_at"] == summary["updated_at"]:
+            items = [(t, y, ids) for kind, t, y, ids in cached["entries"] if kind == m_type]
+            if on_page: on_page(items)
+            return items
+
+        entries, items, complete = [], [], False
+        for body, page, count in self.trakt_pages(f"/users/{user}/lists/{list_id}/items"):
+            page_entries = [en for en in map(trakt_entry, body) if en]
+            entries += page_entries
+            page_items = [(t, y, ids) for kind, t, y, ids in page_entries if kind == m_type]
+            items += page_items
+            if on_page and page_items: on_page(page_items)
+            self.status(f"Trakt list: page {page}/{count}")
+            complete = page >= count
+        self.status("Ready")
+        if not entries and not complete: return None
+        if complete and summary.get("updated_at"): self.trakt_cache.put("lists", key, updated_at=summary["updated_at"], entries=entries)
+        self.trakt_cache.save()
+        return items
+
+    # --- TRAKT SUBSCRIPTIONS ---
+    def subscribe_trakt(self, user, list_id, m_type, name=None):
+        name = name or self.trakt_list_name(user, list_id) or f"{user}/{list_id}"
+        with self.data_lock:
+            existing = self.store.collection_type(name)
+            if existing and existing != m_type:
+                self.log(f"[ERROR] Mismatch! '{name}' is {existing}. Cannot subscribe a {m_type} list.")
+                return None
+            if not existing: self.store.create_collection(name, m_type)
+            self.store.add_subscription(name, user, list_id, m_type)
+        self.log(f"[Trakt] Subscribed '{name}' to {user}/{list_id}.")
+        self.changed()
+        return name
+
+    def unsubscribe_trakt(self, name):
+        if self.store.delete_subscription(name): self.log(f"[Trakt] Unsubscribed '{name}'.")
+
+    def sync_due(self):
+        interval = config_num(self.config, 'trakt_sync_minutes', 360, float) * 60
+        return any(time.time() - sub['synced'] >= interval for sub in self.store.subscriptions())
+
+    def sync_trakt_subscriptions(self, force=False, names=None):
+        # Only one sync at a time; each list is skipped entirely when its updated_at hasn't moved
+        if not self.trakt_sync_lock.acquire(blocking=False): return
+        try:
+            self.sync_cancel_event.clear()
+            interval = config_num(self.config, 'trakt_sync_minutes', 360, float) * 60
+            for sub in self.store.subscriptions():
+                if self.sync_cancel_event.is_set(): break
+                if names is not None and sub['collection'] not in names: continue
+                if force or time.time() - sub['synced'] >= interval: self.sync_trakt_subscription(sub)
+        finally: self.trakt_sync_lock.release()
+
+    def sync_trakt_subscription(self, sub):
+        col, m_type = sub['collection'], sub['type']
+        try:
+            summary = self.trakt_list_summary(sub['user'], sub['list_id'])
+            if summary is None: return
+            if summary.get("updated_at") and summary["updated_at"] == sub['updated_at']:
+                self.store.update_subscription(col, sub['updated_at'], sub['keys'])
+                return
+            items = self.trakt_list_items(sub['user'], sub['list_id'], m_type, summary=summary)
+            if items is None: return
+            current = {(normalize_title(t), y): (t, y, ids) for t, y, ids in items}
+            added = [v for k, v in current.items() if k not in sub['keys']]
+            removed = {k for k in sub['keys'] if k not in current}
+            self.log(f"[Trakt Sync] '{col}': {len(added)} added, {len(removed)} removed.")
+            if added:
+                self.run_process(col, m_type, ({"title": t, "year": y, "found": False, **({"ids": ids} if ids else {})} for t, y, ids in added), self.sync_cancel_event)
+            if removed: self.remove_collection_items(col, m_type, removed)
+            if not self.sync_cancel_event.is_set(): self.store.update_subscription(col, summary.get("updated_at"), set(current))
+        except Exception as e: self.log(f"[Trakt Sync] '{col}' Error: {e}")
+
+    def remove_collection_items(self, col, m_type, keys):
+        # Drops items whose (normalized title, year) is in keys from the store and untags them in Plex
+        gone = [i for i in self.store.items(col) if (normalize_title(i['title']), i['year']) in keys]
+        on_plex = [i for i in gone if i.get('rating_key')]
+        if on_plex:
+            lib = self.get_plex_lib(m_type)
+            if lib:
+                idx = self.get_plex_index(lib)
+                pairs = [(i, idx.by_rating_key[i['rating_key']]) for i in on_plex if i['rating_key'] in idx.by_rating_key]
+                if pairs: self.tag_collection(lib, col, pairs, remove=True)
+        with self.data_lock: self.store.remove_items(gone)
+        self.changed()
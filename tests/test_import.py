@@ -0,0 +1,171 @@
+# Streaming list-file readers: chunked JSON decoding (arrays and JSON Lines), CSV header detection for
+# Letterboxd and IMDb exports, and format sniffing.
+#   python -m pytest tests        or        python -m unittest discover tests
+
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media_core import RowErrors, detect_import_format, iter_import_file, iter_json_values  # noqa: E402
+
+# Small sizes put chunk boundaries inside strings, escapes, numbers and multi-byte characters
+CHUNK_SIZES = (1, 2, 3, 7, 64, 1 << 16)
+
+VALUES = [{"title": "Heat", "year": 1995},
+          {"title": "Amélie — \"Le Fabuleux\"", "year": 2001, "ids": {"imdb": "tt0211915"}},
+          {"title": "[REC]", "year": 2007, "note": "brackets ] and braces } in a string, escaped \\ too"},
+          {"movie": {"title": "Stalker", "year": 1979, "ids": {"tmdb": 1398}}},
+          {"title": "Ran", "year": 1985, "rating": -7.25e1}]
+
+def decode(text, chunk_size, errors=None):
+    return list(iter_json_values(io.StringIO(text), chunk_size=chunk_size, errors=errors))
+
+class JsonValuesTest(unittest.TestCase):
+    def test_compact_array(self):
+        text = json.dumps(VALUES, ensure_ascii=False)
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size): self.assertEqual(decode(text, size), VALUES)
+
+    def test_pretty_printed_array(self):
+        text = json.dumps(VALUES, indent=4, ensure_ascii=False)
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size): self.assertEqual(decode(text, size), VALUES)
+
+    def test_json_lines(self):
+        text = "\n".join(json.dumps(v) for v in VALUES) + "\n"
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size): self.assertEqual(decode(text, size), VALUES)
+
+    def test_json_lines_with_crlf_and_blank_lines(self):
+        text = "\r\n\r\n".join(json.dumps(v) for v in VALUES)
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size): self.assertEqual(decode(text, size), VALUES)
+
+    def test_pretty_printed_wrapper_object(self):
+        wrapper = {"name": "My List", "items": VALUES}
+        text = json.dumps(wrapper, indent=2)
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size): self.assertEqual(decode(text, size), [wrapper])
+
+    def test_bad_json_line_is_reported_and_skipped(self):
+        lines = [json.dumps(VALUES[0]), '{"title": "Broken", "year": 19', json.dumps(VALUES[1]), "not json", json.dumps(VALUES[4])]
+        text = "\n".join(lines) + "\n"
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size):
+                errors = RowErrors(lambda msg: None)
+                self.assertEqual(decode(text, size, errors), [VALUES[0], VALUES[1], VALUES[4]])
+                self.assertEqual([(where, reason) for where, _, reason in errors.rows],
+                                 [("line 2", "Expecting ',' delimiter"), ("line 4", "Expecting value")])
+
+    def test_bad_array_elements_are_reported_and_skipped(self):
+        elements = [json.dumps(VALUES[0]), '{"title": "Broken", "year": 19x9}', json.dumps(VALUES[2]), "{oops: [1, 2]}", json.dumps(VALUES[4])]
+        text = "[\n  " + ",\n  ".join(elements) + "\n]"
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size):
+                errors = RowErrors(lambda msg: None)
+                self.assertEqual(decode(text, size, errors), [VALUES[0], VALUES[2], VALUES[4]])
+                self.assertEqual([(where, text) for where, text, _ in errors.rows],
+                                 [("line 3", elements[1]), ("line 5", elements[3])])
+
+    def test_bad_element_in_a_large_array(self):
+        rows = [json.dumps({"title": f"Film {n}", "year": 1950 + n % 70}) for n in range(50001)]
+        rows[25000] = '{"title": "Bad", "year": 19x9}'
+        errors = RowErrors(lambda msg: None)
+        values = decode("[" + ",\n".join(rows) + "]", 1 << 16, errors)
+        self.assertEqual(len(values), 50000)
+        self.assertEqual(values[25000], {"title": "Film 25001", "year": 1950 + 25001 % 70})
+        self.assertEqual([where for where, _, _ in errors.rows], ["line 25001"])
+
+    def test_unbalanced_element_fails_without_reading_to_eof(self):
+        rows = [json.dumps({"title": f"Film {n}", "year": 1990}) for n in range(100000)]
+        rows[10] = '{"title": "Bad, "year": 1999}'
+        f = io.StringIO("[" + ",".join(rows) + "]")
+        with self.assertRaises(json.JSONDecodeError): list(iter_json_values(f))
+        self.assertLess(f.tell(), len(f.getvalue()))
+
+    def test_scalar_elements_across_chunks(self):
+        values = [12345, -6.02e23, "x", True, None, [1, 22, 333]]
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size): self.assertEqual(decode(json.dumps(values), size), values)
+
+    def test_truncated_array_raises(self):
+        text = json.dumps(VALUES)[:-20]
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size), self.assertRaises(json.JSONDecodeError): decode(text, size)
+
+class ImportFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.logs = []
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, "w", encoding="utf-8", newline="") as f: f.write(text)
+        return path
+
+    def read(self, path, m_type=None, fmt=None):
+        return [(i["title"], i["year"], i.get("ids")) for i in iter_import_file(path, m_type, log=self.logs.append, fmt=fmt)]
+
+class CsvHeaderTest(ImportFileTestCase):
+    LETTERBOXD_LIST = ("Letterboxd list export v7\r\n"
+                       "Date,Name,Tags,URL,Description\r\n"
+                       "2024-03-01,Noir Essentials,,https://boxd.it/abcd,\r\n"
+                       "\r\n"
+                       "Position,Name,Year,URL,Description\r\n"
+                       "1,The Third Man,1949,https://boxd.it/1,\r\n"
+                       "2,\"Kiss Me Deadly\",1955,https://boxd.it/2,\"Mike Hammer, again\"\r\n")
+
+    def test_letterboxd_list_export_skips_the_preamble(self):
+        path = self.write("noir.csv", self.LETTERBOXD_LIST)
+        self.assertEqual(self.read(path), [("The Third Man", 1949, None), ("Kiss Me Deadly", 1955, None)])
+
+    def test_letterboxd_watchlist(self):
+        path = self.write("watchlist.csv", "Date,Name,Year,Letterboxd URI\n2024-01-02,Heat,1995,https://boxd.it/3\n")
+        self.assertEqual(self.read(path), [("Heat", 1995, None)])
+
+    def test_imdb_export_reads_ids_and_filters_by_title_type(self):
+        path = self.write("imdb.csv",
+                          "Const,Your Rating,Date Rated,Title,URL,Title Type,IMDb Rating,Runtime (mins),Year,Genres\n"
+                          "tt0113277,9,2024-01-01,Heat,https://www.imdb.com/title/tt0113277/,Movie,8.3,170,1995,Crime\n"
+                          "tt0098936,10,2024-01-02,Twin Peaks,https://www.imdb.com/title/tt0098936/,TV Series,8.8,47,1990,Drama\n"
+                          "tt0112178,8,2024-01-03,Ran,https://www.imdb.com/title/tt0112178/,TV Mini Series,8,60,1985,Drama\n")
+        self.assertEqual(self.read(path, "movie"), [("Heat", 1995, {"imdb": "tt0113277"})])
+        self.assertEqual([t for t, _, _ in self.read(path, "show")], ["Twin Peaks", "Ran"])
+        self.assertEqual(len(self.read(path)), 3)
+
+    def test_missing_header_is_reported(self):
+        path = self.write("junk.csv", "".join(f"a{n},b{n}\n" for n in range(30)))
+        self.assertEqual(self.read(path), [])
+        self.assertTrue(any("no title/year columns found" in line for line in self.logs))
+
+    def test_bad_rows_are_skipped(self):
+        path = self.write("list.csv", "Title,Year\nHeat,1995\nNo Year,\nRan,abc\nStalker,1979\n")
+        self.assertEqual([t for t, _, _ in self.read(path)], ["Heat", "Stalker"])
+        self.assertTrue(any("2 malformed rows skipped" in line for line in self.logs))
+
+class DetectFormatTest(ImportFileTestCase):
+    def test_extension_wins(self):
+        self.assertEqual(detect_import_format("list.jsonl", "Heat (1995)"), "json")
+        self.assertEqual(detect_import_format("list.tsv", "[x]"), "csv")
+
+    def test_content_sniffing(self):
+        self.assertEqual(detect_import_format("list.txt", '  [{"title": "Heat"}]'), "json")
+        self.assertEqual(detect_import_format("export", "Position,Name,Year\n1,Heat,1995"), "csv")
+        self.assertEqual(detect_import_format("list.txt", "Heat (1995)\nRan (1985)"), "text")
+
+    def test_jsonl_file_end_to_end(self):
+        path = self.write("list.jsonl", "\n".join(json.dumps(v) for v in VALUES) + "\n{oops}\n")
+        self.assertEqual([t for t, _, _ in self.read(path, "movie")], ["Heat", VALUES[1]["title"], "[REC]", "Stalker", "Ran"])
+        self.assertTrue(any("line 6" in line for line in self.logs))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+# CollectionStore schema handling: v1 JSON import, in-place upgrades of older SQLite files, and the
+# trigger-maintained per-collection counters.
+#   python -m pytest tests        or        python -m unittest discover tests
+
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media_core import STORE_SCHEMA_VERSION, load_collections_store, normalize_title  # noqa: E402
+
+def item(title, year, found=False, **extra):
+    return {"title": title, "year": year, "found": found, **extra}
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.db = os.path.join(self.dir, "collections.db")
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores: store.conn.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def open(self):
+        store = load_collections_store(self.db, os.path.join(self.dir, "collections_data.json"))
+        self.stores.append(store)
+        return store
+
+class MigrateJsonTest(StoreTestCase):
+    def test_v1_json_is_imported_and_renamed(self):
+        legacy = os.path.join(self.dir, "collections_data.json")
+        with open(legacy, "w") as f:
+            json.dump({"_schema": 1, "_monitor": {"last": 5},
+                       "Noir": {"type": "movie", "items": [item("The Third Man", 1949, True, rating_key="42"),
+                                                           item("Laura", 1944, ids={"imdb": "tt0037008"})]},
+                       "Shows": {"type": "show", "items": [item("Twin Peaks", 1990)]}}, f)
+
+        store = self.open()
+
+        self.assertEqual(store.version, STORE_SCHEMA_VERSION)
+        self.assertFalse(os.path.exists(legacy))
+        self.assertTrue(os.path.exists(legacy + ".migrated"))
+        self.assertEqual(sorted(store.summaries()), [("Noir", "movie", 1, 2), ("Shows", "show", 0, 1)])
+        noir = {i["title"]: i for i in store.items("Noir")}
+        self.assertEqual(noir["The Third Man"]["rating_key"], "42")
+        self.assertEqual(noir["Laura"]["ids"], {"imdb": "tt0037008"})
+        self.assertEqual(store.get_meta("monitor"), {"last": 5})
+        self.assertIsNone(store.get_meta("schema"))
+
+    def test_second_open_does_not_reimport(self):
+        legacy = os.path.join(self.dir, "collections_data.json")
+        with open(legacy, "w") as f: json.dump({"Noir": {"type": "movie", "items": [item("Laura", 1944)]}}, f)
+        self.open().conn.close()
+        shutil.copy(legacy + ".migrated", legacy)
+
+        store = self.open()
+
+        self.assertEqual(store.summaries(), [("Noir", "movie", 0, 1)])
+        self.assertTrue(os.path.exists(legacy))
+
+    def test_fresh_file_is_stamped_current(self):
+        store = self.open()
+        self.assertEqual(store.version, STORE_SCHEMA_VERSION)
+        self.assertEqual(store.conn.execute("PRAGMA user_version").fetchone()[0], STORE_SCHEMA_VERSION)
+
+class UpgradeSchemaTest(StoreTestCase):
+    def make_v2(self):
+        # The v2 layout as first shipped: no recheck columns, title keys, jobs, subscriptions or counters
+        conn = sqlite3.connect(self.db)
+        conn.executescript("""
+            CREATE TABLE collections (name TEXT PRIMARY KEY, type TEXT NOT NULL, created REAL);
+            CREATE TABLE items (
+                id INTEGER PRIMARY KEY,
+                collection TEXT NOT NULL REFERENCES collections(name) ON DELETE CASCADE,
+                title TEXT NOT NULL, year INTEGER, found INTEGER NOT NULL DEFAULT 0,
+                rating_key TEXT, ids TEXT);
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+            INSERT INTO collections VALUES ('Noir', 'movie', 1), ('Empty', 'show', 2);
+            INSERT INTO items (collection, title, year, found, rating_key) VALUES
+                ('Noir', 'The Third Man', 1949, 1, '42'), ('Noir', 'Laura', 1944, 0, NULL), ('Noir', 'Gilda!', 1946, 1, '7');
+            PRAGMA user_version = 2;
+        """)
+        conn.commit()
+        conn.close()
+
+    def test_v2_file_is_upgraded_in_place(self):
+        self.make_v2()
+        store = self.open()
+
+        self.assertEqual(store.version, STORE_SCHEMA_VERSION)
+        self.assertEqual(store.conn.execute("PRAGMA user_version").fetchone()[0], STORE_SCHEMA_VERSION)
+        cols = {r[1] for r in store.conn.execute("PRAGMA table_info(items)")}
+        self.assertTrue({"next_check", "attempts", "last_seen_state", "title_key"} <= cols)
+        tables = {r[0] for r in store.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertTrue({"jobs", "job_items", "subscriptions"} <= tables)
+
+    def test_upgrade_keeps_rows_and_backfills(self):
+        self.make_v2()
+        store = self.open()
+
+        keys = dict(store.conn.execute("SELECT title, title_key FROM items"))
+        self.assertEqual(keys, {t: normalize_title(t) for t in ("The Third Man", "Laura", "Gilda!")})
+        self.assertEqual(sorted(store.summaries()), [("Empty", "show", 0, 0), ("Noir", "movie", 2, 3)])
+        laura = next(i for i in store.items("Noir") if i["title"] == "Laura")
+        self.assertEqual((laura["next_check"], laura["attempts"]), (0, 0))
+
+    def test_upgrade_is_idempotent(self):
+        self.make_v2()
+        self.open().conn.close()
+        store = self.open()
+        self.assertEqual(sorted(store.summaries()), [("Empty", "show", 0, 0), ("Noir", "movie", 2, 3)])
+
+class CounterTriggerTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = self.open()
+        self.store.create_collection("Noir", "movie")
+        self.store.create_collection("Other", "movie")
+
+    def test_insert_counts_items_and_found(self):
+        self.store.add_items("Noir", [item("Laura", 1944), item("Gilda", 1946, True)])
+        self.assertEqual(tuple(self.store.collection_counts("Noir")), (1, 2))
+        self.assertEqual(tuple(self.store.collection_counts("Other")), (0, 0))
+
+    def test_found_flip_updates_found_count(self):
+        self.store.add_items("Noir", [item("Laura", 1944), item("Gilda", 1946)])
+        laura, gilda = self.store.items("Noir")
+        laura["found"] = True
+        self.store.update_items([laura, gilda])
+        self.assertEqual(tuple(self.store.collection_counts("Noir")), (1, 2))
+        laura["found"] = False
+        self.store.update_items([laura])
+        self.assertEqual(tuple(self.store.collection_counts("Noir")), (0, 2))
+
+    def test_delete_decrements(self):
+        self.store.add_items("Noir", [item("Laura", 1944, True), item("Gilda", 1946)])
+        self.store.remove_items([i for i in self.store.items("Noir") if i["found"]])
+        self.assertEqual(tuple(self.store.collection_counts("Noir")), (0, 1))
+
+    def test_counts_match_a_full_scan(self):
+        self.store.add_items("Noir", [item(f"Film {n}", 1950 + n, n % 3 == 0) for n in range(50)])
+        items = self.store.items("Noir")
+        for i in items[::4]: i["found"] = not i["found"]
+        self.store.update_items(items[::4])
+        self.store.remove_items(items[1::5])
+        found, total = self.store.conn.execute("SELECT SUM(found), COUNT(*) FROM items WHERE collection = 'Noir'").fetchone()
+        self.assertEqual(tuple(self.store.collection_counts("Noir")), (found, total))
+
+    def test_deleted_collection_has_no_counts(self):
+        self.store.add_items("Noir", [item("Laura", 1944)])
+        self.store.delete_collection("Noir")
+        self.assertIsNone(self.store.collection_counts("Noir"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# Trakt subscription syncs against the in-process stub servers from benchmarks/stubs.py (no real
+# Plex/Radarr/Trakt is touched). Each test runs the engine in its own temp working directory.
+#   python -m pytest tests        or        python -m unittest discover tests
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.join(REPO, "benchmarks"))
+
+import media_core  # noqa: E402
+from media_core import MediaEngine, DEFAULT_CONFIG  # noqa: E402
+from stubs import SyntheticLibrary, StubPlex, StubArr, StubTrakt  # noqa: E402
+
+LIST_SIZE = 6  # the stub Trakt list id is its length
+
+class TraktSyncTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        movies, shows = SyntheticLibrary(50, "movie"), SyntheticLibrary(50, "show")
+        cls.stubs = [StubPlex(movies, shows).start(), StubArr(movies, "radarr").start(), StubTrakt(movies).start()]
+
+    @classmethod
+    def tearDownClass(cls):
+        for stub in cls.stubs: stub.stop()
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.dir = tempfile.mkdtemp()
+        os.chdir(self.dir)
+        plex, radarr, trakt = self.stubs
+        self.trakt_api, media_core.TRAKT_API = media_core.TRAKT_API, trakt.url
+        self.logs = []
+        config = {**DEFAULT_CONFIG, "plex_url": plex.url, "radarr_url": radarr.url, "sonarr_url": "", "plex_token": "t",
+                  "radarr_key": "k", "trakt_client_id": "t", "plex_movie_lib": "Movies", "plex_tv_lib": "TV Shows"}
+        self.engine = MediaEngine(config, log=lambda msg, *a, **k: self.logs.append(msg))
+        self.col = self.engine.subscribe_trakt("bench", str(LIST_SIZE), "movie", name="Bench")
+
+    def tearDown(self):
+        self.engine.shutdown()
+        self.engine.store.conn.close()
+        media_core.TRAKT_API = self.trakt_api
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def synced(self):
+        sub = next(s for s in self.engine.store.subscriptions() if s['collection'] == self.col)
+        return len(self.engine.store.items(self.col)), len(sub['keys'])
+
+    def test_sync_after_stop(self):
+        # STOP on a manual run must not leave later syncs (auto refresh, SUBSCRIBE) silently doing nothing
+        self.engine.process_cancel_event.set()
+        self.engine.sync_trakt_subscriptions(force=True)
+        self.assertEqual(self.synced(), (LIST_SIZE, LIST_SIZE))
+        self.assertTrue(any("[Trakt Sync] 'Bench': 6 added" in line for line in self.logs))
+
+    def test_stopped_sync_does_not_block_the_next(self):
+        self.engine.sync_cancel_event.set()
+        self.engine.sync_trakt_subscriptions(force=True)
+        self.assertEqual(self.synced(), (LIST_SIZE, LIST_SIZE))
+
+    def test_stop_during_sync_keeps_the_list_unsynced(self):
+        self.engine.trakt_list_items = lambda *a, _items=self.engine.trakt_list_items, **k: (self.engine.sync_cancel_event.set(), _items(*a, **k))[1]
+        self.engine.sync_trakt_subscriptions(force=True)
+        self.assertEqual(self.synced()[1], 0)
+
+if __name__ == "__main__":
+    unittest.main()
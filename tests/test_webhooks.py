@@ -0,0 +1,82 @@
+# parse_webhook: Plex's multipart/form-data POSTs (JSON "payload" part next to a thumbnail) and the JSON
+# bodies Radarr/Sonarr send.
+#   python -m pytest tests        or        python -m unittest discover tests
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media_core import parse_webhook  # noqa: E402
+
+BOUNDARY = "----PlexWebhook7d21a9"
+THUMB = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\r\n--" + b"\x00\xff" * 64 + b"\xff\xd9"
+
+def multipart(*parts):
+    # parts: (name, body bytes, extra headers) -> (content type, body) as Plex Media Server sends them
+    out = b""
+    for name, body, headers in parts:
+        out += f"--{BOUNDARY}\r\nContent-Disposition: form-data; {name}\r\n{headers}\r\n".encode() + body + b"\r\n"
+    return f"multipart/form-data; boundary={BOUNDARY}", out + f"--{BOUNDARY}--\r\n".encode()
+
+def plex_event(event="library.new", **metadata):
+    return json.dumps({"event": event, "Account": {"title": "jamie"}, "Metadata": metadata}).encode()
+
+MOVIE = {"type": "movie", "title": "Amélie", "year": 2001, "ratingKey": "5120",
+         "Guid": [{"id": "imdb://tt0211915"}, {"id": "tmdb://194"}, {"id": "tvdb://oops"}]}
+
+class MultipartTest(unittest.TestCase):
+    def test_payload_part_with_thumbnail(self):
+        ctype, body = multipart(('name="payload"', plex_event(**MOVIE), "Content-Type: application/json\r\n"),
+                                ('name="thumb"; filename="image.jpg"', THUMB, "Content-Type: image/jpeg\r\n"))
+        self.assertEqual(parse_webhook(ctype, body),
+                         {"source": "plex", "m_type": "movie", "title": "Amélie", "year": 2001,
+                          "ids": {"imdb": "tt0211915", "tmdb": 194}, "rating_key": "5120"})
+
+    def test_thumbnail_first_and_untyped_payload(self):
+        ctype, body = multipart(('name="thumb"; filename="image.jpg"', THUMB, "Content-Type: image/jpeg\r\n"),
+                                ('name="payload"', plex_event(**MOVIE), ""))
+        self.assertEqual(parse_webhook(ctype, body)["title"], "Amélie")
+
+    def test_quoted_boundary(self):
+        ctype, body = multipart(('name="payload"', plex_event(**MOVIE), ""))
+        self.assertEqual(parse_webhook(ctype.replace(BOUNDARY, f'"{BOUNDARY}"'), body)["rating_key"], "5120")
+
+    def test_episode_maps_to_its_show(self):
+        ctype, body = multipart(('name="payload"', plex_event(type="episode", title="Pilot", grandparentTitle="Twin Peaks",
+                                                              grandparentRatingKey="88", ratingKey="90"), ""))
+        self.assertEqual(parse_webhook(ctype, body),
+                         {"source": "plex", "m_type": "show", "title": "Twin Peaks", "year": None, "ids": {}, "rating_key": "88"})
+
+    def test_other_events_and_types_are_ignored(self):
+        for payload in (plex_event("media.play", **MOVIE), plex_event(type="track", title="Song")):
+            ctype, body = multipart(('name="payload"', payload, ""))
+            with self.subTest(payload=payload): self.assertIsNone(parse_webhook(ctype, body))
+
+    def test_missing_payload_part(self):
+        ctype, body = multipart(('name="thumb"; filename="image.jpg"', THUMB, ""))
+        self.assertIsNone(parse_webhook(ctype, body))
+
+    def test_malformed_payload_raises(self):
+        ctype, body = multipart(('name="payload"', b"{not json", ""))
+        with self.assertRaises(ValueError): parse_webhook(ctype, body)
+
+class JsonBodyTest(unittest.TestCase):
+    def test_radarr_download(self):
+        body = json.dumps({"eventType": "Download", "movie": {"title": "Heat", "year": 1995, "tmdbId": 949, "imdbId": "tt0113277"}})
+        self.assertEqual(parse_webhook("application/json", body.encode()),
+                         {"source": "radarr", "m_type": "movie", "title": "Heat", "year": 1995,
+                          "ids": {"imdb": "tt0113277", "tmdb": 949}, "rating_key": None})
+
+    def test_sonarr_download(self):
+        body = json.dumps({"eventType": "Download", "series": {"title": "Twin Peaks", "year": 1990, "tvdbId": 70533}})
+        self.assertEqual(parse_webhook("application/json; charset=utf-8", body.encode())["ids"], {"tvdb": 70533})
+
+    def test_test_event_and_empty_body(self):
+        self.assertIsNone(parse_webhook("application/json", b'{"eventType": "Test"}'))
+        self.assertIsNone(parse_webhook("", b""))
+
+if __name__ == "__main__":
+    unittest.main()